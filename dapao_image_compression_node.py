@@ -1,8 +1,39 @@
 import torch
 import numpy as np
 import io
+import os
+from concurrent.futures import ThreadPoolExecutor
 from PIL import Image
 
+# JPEG 标准量化表 (ITU-T T.81 Annex K)，质量 50 时的基准值
+JPEG_LUMA_QTABLE = [
+    16, 11, 10, 16, 24, 40, 51, 61,
+    12, 12, 14, 19, 26, 58, 60, 55,
+    14, 13, 16, 24, 40, 57, 69, 56,
+    14, 17, 22, 29, 51, 87, 80, 62,
+    18, 22, 37, 56, 68, 109, 103, 77,
+    24, 35, 55, 64, 81, 104, 113, 92,
+    49, 64, 78, 87, 103, 121, 120, 101,
+    72, 92, 95, 98, 112, 100, 103, 99,
+]
+JPEG_CHROMA_QTABLE = [
+    17, 18, 24, 47, 99, 99, 99, 99,
+    18, 21, 26, 66, 99, 99, 99, 99,
+    24, 26, 56, 99, 99, 99, 99, 99,
+    47, 66, 99, 99, 99, 99, 99, 99,
+    99, 99, 99, 99, 99, 99, 99, 99,
+    99, 99, 99, 99, 99, 99, 99, 99,
+    99, 99, 99, 99, 99, 99, 99, 99,
+    99, 99, 99, 99, 99, 99, 99, 99,
+]
+
+# JFIF 色彩转换矩阵 (RGB -> YCbCr)
+RGB_TO_YCBCR = [
+    [0.299, 0.587, 0.114],
+    [-0.168736, -0.331264, 0.5],
+    [0.5, -0.418688, -0.081312],
+]
+
 class DapaoImageCompressionNode:
     """
     画质无损压缩节点
@@ -21,6 +52,10 @@ class DapaoImageCompressionNode:
                     "step": 1, 
                     "tooltip": "压缩质量 (1-100)，数值越高画质越好，建议85-95"
                 }),
+                "engine": (["PIL", "Torch"], {
+                    "default": "PIL",
+                    "tooltip": "PIL=真实JPEG编解码(CPU)；Torch=在输入设备上批量模拟JPEG画质损失，整批不离开显卡"
+                }),
             }
         }
 
@@ -29,46 +64,116 @@ class DapaoImageCompressionNode:
     FUNCTION = "compress_image"
     CATEGORY = "🤖Dapao-Toolbox"
 
-    def compress_image(self, image, quality):
-        result_images = []
+    def compress_image(self, image, quality, engine="PIL"):
+        if engine == "Torch":
+            return (self.torch_jpeg(image, quality),)
         
-        # 处理 batch
-        for i in range(image.shape[0]):
-            img_tensor = image[i]
-            img_pil = self.tensor2pil(img_tensor)
-            
-            # 压缩处理
-            # 使用 BytesIO 在内存中模拟保存 JPEG 过程
-            buffer = io.BytesIO()
-            
-            # 转换模式，确保兼容性
-            if img_pil.mode == 'RGBA':
-                # 如果需要保持透明度，JPEG不支持RGBA，通常转RGB或混合背景
-                # 这里为了压缩效果，如果用户意图是JPEG压缩，通常是RGB
-                # 但为了通用性，如果原图是RGBA，我们先尝试转RGB（JPEG标准）
-                # 或者如果用户想保留透明度但压缩体积，应该用PNG压缩（WebP等）
-                # 按照参考竞品逻辑（JPEG压缩），通常转RGB
-                img_pil = img_pil.convert('RGB')
-            elif img_pil.mode != 'RGB':
-                img_pil = img_pil.convert('RGB')
-                
-            # 保存到 buffer，应用压缩参数
-            # optimize=True: 启用编码优化
-            # subsampling=0: 关闭色度二次采样 (4:4:4)，保持最高颜色质量
-            img_pil.save(buffer, format="JPEG", quality=quality, optimize=True, subsampling=0)
-            
-            # 从 buffer 重新读取
-            buffer.seek(0)
-            compressed_img_pil = Image.open(buffer)
+        batch_size, height, width = image.shape[0], image.shape[1], image.shape[2]
+        
+        # 预分配输出批次，各线程直接写入自己的位置，避免 torch.cat 二次拷贝
+        result = torch.empty((batch_size, height, width, 3), dtype=torch.float32)
+        result_np = result.numpy()
+        
+        def process(i):
+            img_pil = self.tensor2pil(image[i])
+            compressed_img_pil = self.jpeg_round_trip(img_pil, quality)
+            np.divide(np.asarray(compressed_img_pil), np.float32(255.0), out=result_np[i])
+        
+        # PIL 的 JPEG 编解码会释放 GIL，整批分发到线程池并行处理
+        max_workers = min(batch_size, os.cpu_count() or 1)
+        if max_workers > 1:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                # list() 触发结果收集，任一线程的异常会在这里抛出
+                list(executor.map(process, range(batch_size)))
+        else:
+            for i in range(batch_size):
+                process(i)
             
-            # 转回 Tensor
-            result_images.append(self.pil2tensor(compressed_img_pil))
+        return (result,)
+
+    def jpeg_round_trip(self, img_pil, quality):
+        # 压缩处理
+        # 使用 BytesIO 在内存中模拟保存 JPEG 过程
+        buffer = io.BytesIO()
+        
+        # 转换模式，确保兼容性
+        if img_pil.mode == 'RGBA':
+            # 如果需要保持透明度，JPEG不支持RGBA，通常转RGB或混合背景
+            # 这里为了压缩效果，如果用户意图是JPEG压缩，通常是RGB
+            # 但为了通用性，如果原图是RGBA，我们先尝试转RGB（JPEG标准）
+            # 或者如果用户想保留透明度但压缩体积，应该用PNG压缩（WebP等）
+            # 按照参考竞品逻辑（JPEG压缩），通常转RGB
+            img_pil = img_pil.convert('RGB')
+        elif img_pil.mode != 'RGB':
+            img_pil = img_pil.convert('RGB')
             
-        # 合并 batch
-        if len(result_images) > 1:
-            return (torch.cat(result_images, dim=0),)
-        else:
-            return (result_images[0],)
+        # 保存到 buffer，应用压缩参数
+        # optimize=True: 启用编码优化
+        # subsampling=0: 关闭色度二次采样 (4:4:4)，保持最高颜色质量
+        img_pil.save(buffer, format="JPEG", quality=quality, optimize=True, subsampling=0)
+        
+        # 从 buffer 重新读取，并在线程内完成解码
+        buffer.seek(0)
+        compressed_img_pil = Image.open(buffer)
+        compressed_img_pil.load()
+        return compressed_img_pil
+
+    def torch_jpeg(self, image, quality):
+        """
+        用张量运算模拟 JPEG (4:4:4) 压缩：YCbCr 转换、8x8 分块 DCT、
+        按质量缩放的量化表量化、逆 DCT，整批在输入设备上完成
+        """
+        device = image.device
+        B, H, W = image.shape[0], image.shape[1], image.shape[2]
+        rgb = image[..., :3].float() * 255.0
+        
+        # 1. RGB -> YCbCr，并减去 128 电平偏移（Cb/Cr 的 +128 与其抵消）
+        to_ycc = torch.tensor(RGB_TO_YCBCR, dtype=torch.float32, device=device)
+        ycc = torch.einsum("bhwc,dc->bdhw", rgb, to_ycc)
+        ycc[:, 0] -= 128.0
+        
+        # 2. 边缘复制补齐到 8 的倍数（与 libjpeg 一致）
+        pad_h = (-H) % 8
+        pad_w = (-W) % 8
+        if pad_h or pad_w:
+            ycc = torch.nn.functional.pad(ycc, (0, pad_w, 0, pad_h), mode="replicate")
+        Hp, Wp = H + pad_h, W + pad_w
+        
+        # [B, 3, Hp, Wp] -> [B, 3, Hp/8, Wp/8, 8, 8]
+        blocks = ycc.view(B, 3, Hp // 8, 8, Wp // 8, 8).permute(0, 1, 2, 4, 3, 5)
+        
+        # 3. 正交 DCT-II 矩阵，二维 DCT = D @ X @ D^T
+        dct = self.dct_matrix(device)
+        coeffs = dct @ blocks @ dct.T
+        
+        # 4. 按质量缩放的量化表，亮度/色度分别量化
+        qtables = self.quant_tables(quality, device).view(1, 3, 1, 1, 8, 8)
+        coeffs = torch.round(coeffs / qtables) * qtables
+        
+        # 5. 逆 DCT 并还原图像布局
+        blocks = dct.T @ coeffs @ dct
+        ycc = blocks.permute(0, 1, 2, 4, 3, 5).reshape(B, 3, Hp, Wp)[:, :, :H, :W]
+        ycc[:, 0] += 128.0
+        
+        # 6. YCbCr -> RGB，按 8 位整数输出
+        to_rgb = torch.linalg.inv(to_ycc)
+        rgb = torch.einsum("bdhw,cd->bhwc", ycc, to_rgb)
+        rgb = torch.round(rgb).clamp_(0, 255)
+        return rgb / 255.0
+
+    def dct_matrix(self, device):
+        n = torch.arange(8, dtype=torch.float32, device=device)
+        dct = torch.cos((2 * n[None, :] + 1) * n[:, None] * torch.pi / 16)
+        dct[0] *= 1 / np.sqrt(2)
+        return dct * 0.5
+
+    def quant_tables(self, quality, device):
+        # libjpeg 的质量缩放规则 (jpeg_quality_scaling)
+        quality = min(max(int(quality), 1), 100)
+        scale = 5000 / quality if quality < 50 else 200 - quality * 2
+        base = torch.tensor([JPEG_LUMA_QTABLE, JPEG_CHROMA_QTABLE, JPEG_CHROMA_QTABLE], dtype=torch.float32, device=device)
+        tables = torch.floor((base * scale + 50) / 100).clamp_(1, 255)
+        return tables.view(3, 8, 8)
 
     def tensor2pil(self, image):
         return Image.fromarray(np.clip(255. * image.cpu().numpy(), 0, 255).astype(np.uint8))
@@ -1,7 +1,215 @@
+import functools
 import torch
 import numpy as np
 from PIL import Image, ImageDraw, ImageFont
 
+# 预设选项（节点下拉列表与分辨率表共用）
+MEGAPIXEL_OPTIONS = [f"{i/10:.1f}" for i in range(1, 51)]  # 0.1 到 5.0，步长 0.1
+DIVISOR_OPTIONS = ["8", "16", "32", "64"]
+ASPECT_RATIO_PRESETS = [
+    "1:1 (正方形)",
+    "2:3 (经典竖屏)", "3:4 (黄金比例竖)", "3:5 (优雅竖屏)", "4:5 (艺术画框竖)", "5:7 (标准竖屏)", "5:8 (高耸竖屏)",
+    "7:9 (现代竖屏)", "9:16 (手机竖屏)", "9:19 (高瘦竖屏)", "9:21 (超高竖屏)", "9:32 (摩天大楼)",
+    "3:2 (经典横屏)", "4:3 (黄金比例横)", "5:3 (宽视野)", "5:4 (平衡画框横)", "7:5 (优雅横屏)", "8:5 (电影视角)",
+    "9:7 (艺术横屏)", "16:9 (电脑屏幕)", "19:9 (电影超宽)", "21:9 (史诗超宽)", "32:9 (极限超宽)"
+]
+
+# 最优解搜索范围：理想宽高向下取整后的倍数 -1 ~ +2
+_SEARCH_OFFSETS = np.arange(-1, 3)
+
+
+def _solve_best_fit(width_ratio, height_ratio, megapixels, divisors):
+    """
+    向量化求解：在理想宽高附近的整除倍数中，选择比例误差与面积误差（对数）之和最小的组合
+
+    参数可以是可广播的数组，返回 (width, height, aspect_error, area_error) 四个数组，
+    误差为相对误差：实际/目标 - 1
+    """
+    ratio = np.asarray(width_ratio, dtype=np.float64) / np.asarray(height_ratio, dtype=np.float64)
+    area = np.asarray(megapixels, dtype=np.float64) * 1_000_000
+    divisors = np.asarray(divisors, dtype=np.int64)
+    ratio, area, divisors = np.broadcast_arrays(ratio, area, divisors)
+
+    base_w = np.floor(np.sqrt(area * ratio) / divisors).astype(np.int64)
+    base_h = np.floor(np.sqrt(area / ratio) / divisors).astype(np.int64)
+    widths = np.maximum(base_w[..., None, None] + _SEARCH_OFFSETS[:, None], 1) * divisors[..., None, None]
+    heights = np.maximum(base_h[..., None, None] + _SEARCH_OFFSETS[None, :], 1) * divisors[..., None, None]
+    widths, heights = np.broadcast_arrays(widths, heights)
+
+    aspect = (widths / heights) / ratio[..., None, None]
+    coverage = (widths * heights) / area[..., None, None]
+    score = np.abs(np.log(aspect)) + np.abs(np.log(coverage))
+
+    flat = score.reshape(score.shape[:-2] + (-1,)).argmin(axis=-1)
+    best_w = np.take_along_axis(widths.reshape(flat.shape + (-1,)), flat[..., None], axis=-1)[..., 0]
+    best_h = np.take_along_axis(heights.reshape(flat.shape + (-1,)), flat[..., None], axis=-1)[..., 0]
+    return best_w, best_h, best_w / best_h / ratio - 1.0, best_w * best_h / area - 1.0
+
+
+def parse_ratio(ratio_str):
+    """解析 "16:9" 或 "16:9 (说明)" 形式的宽高比，返回 (宽比, 高比)"""
+    width_ratio, height_ratio = map(int, ratio_str.split(' ')[0].split(':'))
+    if width_ratio <= 0 or height_ratio <= 0:
+        raise ValueError(f"invalid ratio '{ratio_str}'")
+    return width_ratio, height_ratio
+
+
+def _build_resolution_table():
+    """预设比例 × 百万像素 × 整除倍数 的全部最优分辨率，模块加载时一次算完"""
+    ratios = [parse_ratio(preset) for preset in ASPECT_RATIO_PRESETS]
+    ratio_w = np.array([r[0] for r in ratios])[:, None, None]
+    ratio_h = np.array([r[1] for r in ratios])[:, None, None]
+    megapixels = np.array([float(m) for m in MEGAPIXEL_OPTIONS])[None, :, None]
+    divisors = np.array([int(d) for d in DIVISOR_OPTIONS])[None, None, :]
+    widths, heights, aspect_errors, area_errors = _solve_best_fit(ratio_w, ratio_h, megapixels, divisors)
+
+    table = {}
+    for i, (rw, rh) in enumerate(ratios):
+        for j, megapixel in enumerate(MEGAPIXEL_OPTIONS):
+            for k, divisor in enumerate(DIVISOR_OPTIONS):
+                table[(rw, rh, megapixel, int(divisor))] = (
+                    int(widths[i, j, k]), int(heights[i, j, k]),
+                    float(aspect_errors[i, j, k]), float(area_errors[i, j, k]),
+                )
+    return table
+
+
+RESOLUTION_TABLE = _build_resolution_table()
+
+
+def solve_resolution(width_ratio, height_ratio, megapixels, divisible_by):
+    """
+    求给定宽高比、百万像素与整除倍数下的最优分辨率
+
+    返回 (width, height, aspect_error, area_error)；误差为相对误差（实际/目标 - 1）。
+    预设组合直接查表（O(1)），其他组合（如自定义比例）即时求解
+    """
+    key = (width_ratio, height_ratio, f"{float(megapixels):.1f}", int(divisible_by))
+    cached = RESOLUTION_TABLE.get(key)
+    if cached is not None and abs(float(megapixels) - float(key[2])) < 1e-9:
+        return cached
+    width, height, aspect_error, area_error = _solve_best_fit(width_ratio, height_ratio, megapixels, divisible_by)
+    return int(width), int(height), float(aspect_error), float(area_error)
+
+
+# 预览画布默认边长；布局按 1024 设计，其他尺寸等比缩放
+PREVIEW_SIZE = 1024
+PREVIEW_SIZE_OPTIONS = ["1024", "512", "256", "128"]
+
+# 预览字体候选（按顺序尝试，模块加载时只解析一次）
+PREVIEW_FONT_CANDIDATES = [
+    "arial.ttf",
+    "DejaVuSans.ttf",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "/System/Library/Fonts/Supplemental/Arial.ttf",
+]
+
+
+def _resolve_font_path():
+    for candidate in PREVIEW_FONT_CANDIDATES:
+        try:
+            ImageFont.truetype(candidate, 12)
+            return candidate
+        except OSError:
+            continue
+    return None
+
+
+PREVIEW_FONT_PATH = _resolve_font_path()
+
+
+@functools.lru_cache(maxsize=32)
+def get_preview_font(size):
+    """按字号缓存字体对象；没有可用的 TrueType 字体时使用 Pillow 内置字体"""
+    if PREVIEW_FONT_PATH is not None:
+        return ImageFont.truetype(PREVIEW_FONT_PATH, size)
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:
+        # Pillow < 10.1 的内置字体不支持字号
+        return ImageFont.load_default()
+
+
+@functools.lru_cache(maxsize=8)
+def render_preview_grid(preview_size):
+    """黑底深灰网格背景，每种预览尺寸只绘制一次"""
+    image = Image.new('RGB', (preview_size, preview_size), (0, 0, 0))
+    draw = ImageDraw.Draw(image)
+    grid_spacing = max(4, round(50 * preview_size / 1024))
+    for x in range(0, preview_size, grid_spacing):
+        draw.line([(x, 0), (x, preview_size)], fill='#333333')
+    for y in range(0, preview_size, grid_spacing):
+        draw.line([(0, y), (preview_size, y)], fill='#333333')
+    return image
+
+
+@functools.lru_cache(maxsize=16)
+def render_preview_array(width, height, ratio_display, preview_size=PREVIEW_SIZE):
+    """
+    绘制比例预览图，返回只读的 [H, W, 3] uint8 数组，结果按参数缓存
+
+    布局与 1024 画布一致：最长边 800 的红框居中，框内显示分辨率与比例，框下显示分辨率信息
+    """
+    scale = preview_size / 1024
+    image = render_preview_grid(preview_size).copy()
+    draw = ImageDraw.Draw(image)
+
+    # 计算预览框尺寸（最大800像素）
+    box_max = round(800 * scale)
+    preview_width = box_max
+    preview_height = int(preview_width * (height / width))
+
+    # 如果高度过高，则以高度为基准
+    if preview_height > box_max:
+        preview_height = box_max
+        preview_width = int(preview_height * (width / height))
+
+    # 计算居中位置
+    x_offset = (preview_size - preview_width) // 2
+    y_offset = (preview_size - preview_height) // 2
+
+    # 绘制红框
+    draw.rectangle(
+        [(x_offset, y_offset), (x_offset + preview_width, y_offset + preview_height)],
+        outline='red',
+        width=max(1, round(4 * scale))
+    )
+
+    # 绘制文本
+    try:
+        text_y = y_offset + preview_height // 2
+        line_gap = round(60 * scale)
+
+        # 分辨率文本 (红色)
+        draw.text((preview_size // 2, text_y),
+                  f"{width}x{height}",
+                  fill='red',
+                  anchor="mm",
+                  font=get_preview_font(max(8, round(48 * scale))))
+
+        # 比例文本 (红色)
+        draw.text((preview_size // 2, text_y + line_gap),
+                  f"({ratio_display})",
+                  fill='red',
+                  anchor="mm",
+                  font=get_preview_font(max(8, round(36 * scale))))
+
+        # 底部信息文本 (白色)
+        draw.text((preview_size // 2, y_offset + preview_height + line_gap),
+                  f"Resolution: {width} x {height}",
+                  fill='white',
+                  anchor="mm",
+                  font=get_preview_font(max(8, round(32 * scale))))
+
+    except Exception as e:
+        print(f"DapaoImageRatioLimitNode: Error drawing text - {e}")
+
+    # 缓存的数组会被多次返回，设为只读防止被意外修改
+    array = np.asarray(image, dtype=np.uint8)
+    array.setflags(write=False)
+    return array
+
+
 class DapaoImageRatioLimitNode:
     """
     图像比尺寸限定节点
@@ -9,24 +217,16 @@ class DapaoImageRatioLimitNode:
     
     @classmethod
     def INPUT_TYPES(cls):
-        # 生成 0.1 到 5.0 的百万像素选项，步长 0.1
-        megapixel_options = [f"{i/10:.1f}" for i in range(1, 51)]
-        
         return {
             "required": {
-                "🔢 百万像素": (megapixel_options, {"default": "1.0", "tooltip": "目标图像的总像素数（百万级）"}),
-                "📐 宽高比": ([
-                    "1:1 (正方形)",
-                    "2:3 (经典竖屏)", "3:4 (黄金比例竖)", "3:5 (优雅竖屏)", "4:5 (艺术画框竖)", "5:7 (标准竖屏)", "5:8 (高耸竖屏)",
-                    "7:9 (现代竖屏)", "9:16 (手机竖屏)", "9:19 (高瘦竖屏)", "9:21 (超高竖屏)", "9:32 (摩天大楼)",
-                    "3:2 (经典横屏)", "4:3 (黄金比例横)", "5:3 (宽视野)", "5:4 (平衡画框横)", "7:5 (优雅横屏)", "8:5 (电影视角)",
-                    "9:7 (艺术横屏)", "16:9 (电脑屏幕)", "19:9 (电影超宽)", "21:9 (史诗超宽)", "32:9 (极限超宽)"
-                ], {"default": "1:1 (正方形)", "tooltip": "预设的宽高比"}),
-                "🔢 整除倍数": (["8", "16", "32", "64"], {"default": "64", "tooltip": "宽高数值必须能被此数整除"}),
+                "🔢 百万像素": (MEGAPIXEL_OPTIONS, {"default": "1.0", "tooltip": "目标图像的总像素数（百万级）"}),
+                "📐 宽高比": (ASPECT_RATIO_PRESETS, {"default": "1:1 (正方形)", "tooltip": "预设的宽高比"}),
+                "🔢 整除倍数": (DIVISOR_OPTIONS, {"default": "64", "tooltip": "宽高数值必须能被此数整除"}),
                 "🔘 启用自定义比例": ("BOOLEAN", {"default": False, "label_on": "启用", "label_off": "禁用", "tooltip": "是否使用下方自定义宽高比"}),
             },
             "optional": {
                 "✏️ 自定义宽高比": ("STRING", {"default": "1:1", "tooltip": "格式如 16:9"}),
+                "🖼️ 预览尺寸": (PREVIEW_SIZE_OPTIONS, {"default": "1024", "tooltip": "预览图边长，较小的尺寸可作为缩略图"}),
             }
         }
 
@@ -36,85 +236,11 @@ class DapaoImageRatioLimitNode:
     CATEGORY = "🤖Dapao-Toolbox"
     OUTPUT_NODE = True
 
-    def create_preview_image(self, width, height, resolution, ratio_display):
-        # 1024x1024 预览画布
-        preview_size = (1024, 1024)
-        image = Image.new('RGB', preview_size, (0, 0, 0))  # 黑色背景
-        draw = ImageDraw.Draw(image)
-
-        # 绘制深灰色网格
-        grid_color = '#333333'
-        grid_spacing = 50
-        for x in range(0, preview_size[0], grid_spacing):
-            draw.line([(x, 0), (x, preview_size[1])], fill=grid_color)
-        for y in range(0, preview_size[1], grid_spacing):
-            draw.line([(0, y), (preview_size[0], y)], fill=grid_color)
-
-        # 计算预览框尺寸（最大800像素）
-        preview_width = 800
-        preview_height = int(preview_width * (height / width))
-        
-        # 如果高度过高，则以高度为基准
-        if preview_height > 800:
-            preview_height = 800
-            preview_width = int(preview_height * (width / height))
-
-        # 计算居中位置
-        x_offset = (preview_size[0] - preview_width) // 2
-        y_offset = (preview_size[1] - preview_height) // 2
-
-        # 绘制红框
-        draw.rectangle(
-            [(x_offset, y_offset), (x_offset + preview_width, y_offset + preview_height)],
-            outline='red',
-            width=4
-        )
-
-        # 绘制文本
-        try:
-            # 计算文本位置
-            text_y = y_offset + preview_height // 2
-            
-            # 分辨率文本 (红色)
-            font_size_large = 48
-            font_size_medium = 36
-            font_size_small = 32
-            
-            # 尝试加载默认字体，如果失败则使用默认字体对象
-            try:
-                font_large = ImageFont.truetype("arial.ttf", font_size_large)
-                font_medium = ImageFont.truetype("arial.ttf", font_size_medium)
-                font_small = ImageFont.truetype("arial.ttf", font_size_small)
-            except:
-                font_large = ImageFont.load_default()
-                font_medium = ImageFont.load_default()
-                font_small = ImageFont.load_default()
-
-            draw.text((preview_size[0]//2, text_y), 
-                     f"{width}x{height}", 
-                     fill='red', 
-                     anchor="mm",
-                     font=font_large)
-            
-            # 比例文本 (红色)
-            draw.text((preview_size[0]//2, text_y + 60),
-                     f"({ratio_display})",
-                     fill='red',
-                     anchor="mm",
-                     font=font_medium)
-            
-            # 底部信息文本 (白色)
-            draw.text((preview_size[0]//2, y_offset + preview_height + 60),
-                     f"Resolution: {resolution}",
-                     fill='white',
-                     anchor="mm",
-                     font=font_small)
-            
-        except Exception as e:
-            print(f"DapaoImageRatioLimitNode: Error drawing text - {e}")
-
-        # 转换为 Tensor
-        return self.pil2tensor(image)
+    def create_preview_image(self, width, height, resolution, ratio_display, preview_size=PREVIEW_SIZE):
+        # 预览图按 (宽, 高, 比例, 预览尺寸) 缓存；分辨率文本由宽高决定
+        # 缓存的是 uint8 数组，每次调用生成新的张量，下游的原地操作不会影响之后的预览
+        array = render_preview_array(width, height, ratio_display, preview_size)
+        return torch.from_numpy(np.divide(array, np.float32(255.0), dtype=np.float32)).unsqueeze(0)
 
     def calculate_dimensions(self, **kwargs):
         # 获取参数
@@ -123,6 +249,7 @@ class DapaoImageRatioLimitNode:
         divisible_by = int(kwargs.get("🔢 整除倍数", "64"))
         use_custom = kwargs.get("🔘 启用自定义比例", False)
         custom_ratio_str = kwargs.get("✏️ 自定义宽高比", "1:1")
+        preview_size = int(kwargs.get("🖼️ 预览尺寸", PREVIEW_SIZE))
 
         if use_custom and custom_ratio_str:
             numeric_ratio = custom_ratio_str
@@ -132,29 +259,19 @@ class DapaoImageRatioLimitNode:
             ratio_display = numeric_ratio
         
         try:
-            width_ratio, height_ratio = map(int, numeric_ratio.split(':'))
+            width_ratio, height_ratio = parse_ratio(numeric_ratio)
         except ValueError:
             # 容错处理：如果格式错误，默认 1:1
             width_ratio, height_ratio = 1, 1
             print(f"DapaoImageRatioLimitNode: Invalid ratio format '{numeric_ratio}', using 1:1")
         
-        total_pixels = megapixel * 1_000_000
-        dimension = (total_pixels / (width_ratio * height_ratio)) ** 0.5
-        width = int(dimension * width_ratio)
-        height = int(dimension * height_ratio)
-
-        # 应用整除倍数
-        width = round(width / divisible_by) * divisible_by
-        height = round(height / divisible_by) * divisible_by
-        
-        # 防止 0 尺寸
-        width = max(divisible_by, width)
-        height = max(divisible_by, height)
+        # 在整除倍数附近搜索比例与面积误差之和最小的宽高（预设组合直接查表）
+        width, height, _, _ = solve_resolution(width_ratio, height_ratio, megapixel, divisible_by)
 
         resolution = f"{width} x {height}"
         
         # 生成预览图
-        preview = self.create_preview_image(width, height, resolution, ratio_display)
+        preview = self.create_preview_image(width, height, resolution, ratio_display, preview_size)
         
         return (width, height, resolution, preview)
 
@@ -0,0 +1,130 @@
+import os
+import threading
+import time
+
+import numpy as np
+import psutil
+import torch
+
+# 每条采样记录的字段（字节数，time 为秒）
+TELEMETRY_FIELDS = (
+    "time",
+    "ram_used",
+    "ram_total",
+    "swap_used",
+    "process_rss",
+    "torch_allocated",
+    "torch_reserved",
+)
+
+DEFAULT_INTERVAL = 0.5
+DEFAULT_CAPACITY = 1200  # 默认间隔下约 10 分钟
+MIN_INTERVAL = 0.05
+
+
+class MemorySampler:
+    """
+    后台内存采样器：按固定间隔把 RAM / 交换区 / 进程 RSS / Torch 显存写入定长环形缓冲
+
+    - 缓冲为 [capacity, len(TELEMETRY_FIELDS)] 的 float64 数组，写满后覆盖最旧的记录
+    - seq 为累计写入条数，读取端可以只取 since 之后的新记录
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = int(capacity)
+        self.buffer = np.zeros((self.capacity, len(TELEMETRY_FIELDS)), dtype=np.float64)
+        self.seq = 0
+        self.interval = DEFAULT_INTERVAL
+        self.device = None
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.process = psutil.Process(os.getpid())
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self, interval=DEFAULT_INTERVAL, device=None):
+        """启动采样线程；已在运行时只更新间隔与设备"""
+        self.interval = max(MIN_INTERVAL, float(interval))
+        self.device = device
+        if self.running:
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name="DapaoMemorySampler", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        thread = self.thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=max(1.0, self.interval * 2))
+        self.thread = None
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            try:
+                self.sample()
+            except Exception as e:
+                print(f"[Dapao] 内存采样失败: {e}")
+            # wait 可被 stop() 立即唤醒
+            self.stop_event.wait(self.interval)
+
+    def _torch_memory(self):
+        device = self.device
+        if device is None or getattr(device, "type", None) != "cuda" or not torch.cuda.is_available():
+            return 0, 0
+        return torch.cuda.memory_allocated(device), torch.cuda.memory_reserved(device)
+
+    def sample(self):
+        """采一条记录写入环形缓冲，返回该记录"""
+        vm = psutil.virtual_memory()
+        swap = psutil.swap_memory()
+        torch_allocated, torch_reserved = self._torch_memory()
+        row = (
+            time.time(),
+            vm.total - vm.available,
+            vm.total,
+            swap.used,
+            self.process.memory_info().rss,
+            torch_allocated,
+            torch_reserved,
+        )
+        with self.lock:
+            self.buffer[self.seq % self.capacity] = row
+            self.seq += 1
+        return row
+
+    def snapshot(self, since=0):
+        """
+        按时间顺序返回 since 之后（不含）仍在缓冲内的记录
+
+        返回 (seq, rows)，rows 为 [n, len(TELEMETRY_FIELDS)] 数组
+        """
+        with self.lock:
+            seq = self.seq
+            first = max(int(since), seq - self.capacity, 0)
+            positions = np.arange(first, seq) % self.capacity
+            rows = self.buffer[positions].copy()
+        return seq, rows
+
+    def peaks(self):
+        """缓冲窗口内各字段的峰值（字段名 -> 数值）"""
+        _, rows = self.snapshot()
+        if rows.size == 0:
+            return {}
+        return dict(zip(TELEMETRY_FIELDS[1:], rows[:, 1:].max(axis=0).tolist()))
+
+
+_sampler = None
+_sampler_lock = threading.Lock()
+
+
+def get_memory_sampler():
+    """进程内共享的采样器（首次调用时创建，不自动启动）"""
+    global _sampler
+    with _sampler_lock:
+        if _sampler is None:
+            _sampler = MemorySampler()
+        return _sampler
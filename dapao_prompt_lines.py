@@ -0,0 +1,417 @@
+import hashlib
+import mmap
+import os
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# 进程级缓存最多保留的文本数量（按最近使用淘汰）
+LINE_INDEX_CACHE_SIZE = 16
+
+# 文件模式下每个库最多记忆的预处理结果行数（按最近使用淘汰），避免反复运行后把整个库复制进内存
+FILE_PROCESSED_CACHE_SIZE = 65536
+
+# 提示词库文件的行偏移索引：保存在库文件旁，文件大小或修改时间变化后自动重建
+FILE_INDEX_SUFFIX = ".lineidx.npz"
+FILE_INDEX_VERSION = 2
+
+# 建立索引时每次扫描的字节数（限制临时数组的内存占用）
+FILE_INDEX_CHUNK = 64 * 1024 * 1024
+
+# 出现即说明该行非空的字节：ASCII 非空白字符，以及除 C2/E1/E2/E3 之外的 UTF-8 首字节
+# （Unicode 空白字符的 UTF-8 编码都以 C2/E1/E2/E3 开头）
+_VISIBLE_BYTES = np.zeros(256, dtype=bool)
+_VISIBLE_BYTES[:128] = True
+_VISIBLE_BYTES[[9, 10, 11, 12, 13, 28, 29, 30, 31, 32]] = False
+_VISIBLE_BYTES[0xC3:] = True
+_VISIBLE_BYTES[[0xE1, 0xE2, 0xE3]] = False
+
+# 行尾权重写法：提示词::3.5（不写权重的行按 1 计）
+WEIGHT_SUFFIX = re.compile(r"\s*::\s*(\d+(?:\.\d*)?|\.\d+)\s*$")
+
+# 带权重不放回抽样时，拒绝重复的最大尝试次数（倍数），超过后允许重复
+WEIGHTED_SAMPLE_ATTEMPTS = 8
+
+_line_index_cache = OrderedDict()
+_line_index_lock = threading.Lock()
+
+
+class PromptLineIndex:
+    """
+    已拆分、已过滤空行的提示词行集合
+
+    说明：
+    - lines 只在创建时计算一次，之后抽样只按下标取行，开销与抽取行数相关
+    - 预处理结果按 (选项, 行号) 记忆，同一行在同一选项下只处理一次；
+      processed_cache_size 不为 None 时按最近使用淘汰，最多保留该数量的行
+    """
+
+    processed_cache_size = None
+
+    def __init__(self, text):
+        lines = [ln for ln in text.splitlines() if ln.strip() != ""]
+        self.weights = None
+        if "::" in text:
+            lines, self.weights = parse_weighted_lines(lines)
+        self.lines = lines
+        self._alias = None
+        self._processed = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.lines)
+
+    def get_lines(self, indices):
+        lines = self.lines
+        return [lines[i] for i in indices]
+
+    def get_processed(self, indices, option, preprocess):
+        """按下标取行并应用预处理，结果按选项缓存"""
+        indices = list(indices)
+        memo = self._processed
+        with self._lock:
+            cached = [memo.get((option, i)) for i in indices]
+            if self.processed_cache_size is not None:
+                for i, value in zip(indices, cached):
+                    if value is not None:
+                        memo.move_to_end((option, i))
+        # 未缓存的行一次取齐（文件模式下只打开一次文件，按偏移顺序读取）
+        misses = sorted({i for i, value in zip(indices, cached) if value is None})
+        if not misses:
+            return cached
+        fresh = {i: preprocess(line, option) for i, line in zip(misses, self.get_lines(misses))}
+        with self._lock:
+            memo.update(((option, i), value) for i, value in fresh.items())
+            if self.processed_cache_size is not None:
+                while len(memo) > self.processed_cache_size:
+                    memo.popitem(last=False)
+        return [value if value is not None else fresh[i] for i, value in zip(indices, cached)]
+
+    def alias_table(self):
+        """权重对应的 Walker 别名表，首次使用时建立"""
+        with self._lock:
+            if self._alias is None:
+                self._alias = build_alias_table(self.weights)
+            return self._alias
+
+    def draw_weighted(self, rng):
+        """按权重抽取一个行号，O(1)"""
+        prob, alias = self.alias_table()
+        i = rng.randrange(len(prob))
+        return i if rng.random() < prob[i] else int(alias[i])
+
+    def sample_weighted(self, rng, pick_count):
+        """
+        按权重抽取 pick_count 个行号（升序）
+
+        与不带权重时一致：数量不超过行数时尽量不重复；
+        拒绝重复超过尝试上限（如大部分权重为 0）后允许重复
+        """
+        if pick_count <= 1:
+            return [self.draw_weighted(rng)]
+        if pick_count > len(self):
+            return sorted(self.draw_weighted(rng) for _ in range(pick_count))
+
+        picked = set()
+        attempts = WEIGHTED_SAMPLE_ATTEMPTS * pick_count
+        while len(picked) < pick_count and attempts > 0:
+            picked.add(self.draw_weighted(rng))
+            attempts -= 1
+        indices = list(picked)
+        indices.extend(self.draw_weighted(rng) for _ in range(pick_count - len(indices)))
+        return sorted(indices)
+
+
+class FilePromptLineIndex(PromptLineIndex):
+    """
+    提示词库文件的行偏移索引
+
+    说明：
+    - 行偏移只在第一次使用时扫描整个文件建立（扫描期间内存映射，建完即关闭），并保存到库文件旁的索引文件
+    - 抽样时按偏移 seek 读取对应行，读完立即关闭文件，不长期占用句柄
+      （Windows 下打开的句柄/映射会阻止编辑器原地保存或截断库文件）
+    - 行只以 \n 或 \r\n 分隔（与 str.splitlines() 不同，\r、\v、\x1c 等不视为换行），
+      只含空白的行与文本模式一样被忽略
+    - 预处理结果的记忆有行数上限（FILE_PROCESSED_CACHE_SIZE），不会随运行次数增长到整个库
+    """
+
+    processed_cache_size = FILE_PROCESSED_CACHE_SIZE
+
+    def __init__(self, path, size, mtime_ns):
+        self.path = path
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.starts, self.ends, self.weights = load_or_build_file_index(path, size, mtime_ns)
+        self._alias = None
+        self._processed = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.starts)
+
+    def get_lines(self, indices):
+        indices = list(indices)
+        starts, ends = self.starts, self.ends
+        lines = [None] * len(indices)
+        with open(self.path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            if stat.st_size != self.size or stat.st_mtime_ns != self.mtime_ns:
+                raise ValueError(f"提示词库文件在读取期间被修改: {self.path}")
+            # 按偏移顺序读取，减少来回 seek
+            for slot in sorted(range(len(indices)), key=lambda k: starts[indices[k]]):
+                i = indices[slot]
+                f.seek(int(starts[i]))
+                lines[slot] = f.read(int(ends[i] - starts[i])).decode("utf-8", errors="replace")
+        return lines
+
+
+def parse_weighted_lines(lines):
+    """
+    解析行尾的 ::权重，返回 (去掉权重后的行, 权重数组)
+
+    去掉权重后为空的行会被丢弃；没有任何行写权重、或权重全为 0 时返回的权重为 None
+    """
+    texts, weights = [], []
+    has_weight = False
+    for ln in lines:
+        match = WEIGHT_SUFFIX.search(ln)
+        if match:
+            has_weight = True
+            ln = ln[:match.start()]
+            if ln.strip() == "":
+                continue
+            weights.append(float(match.group(1)))
+        else:
+            weights.append(1.0)
+        texts.append(ln)
+    if not has_weight or sum(weights) <= 0:
+        return texts, None
+    return texts, np.asarray(weights, dtype=np.float64)
+
+
+def build_alias_table(weights):
+    """
+    Walker/Vose 别名表：返回 (prob, alias)
+
+    抽样时均匀选一个格子 i，以 prob[i] 的概率取 i，否则取 alias[i]
+    """
+    n = len(weights)
+    scaled = np.asarray(weights, dtype=np.float64) * (n / float(np.sum(weights)))
+    prob = np.ones(n, dtype=np.float64)
+    alias = np.arange(n, dtype=np.int64)
+
+    small = np.flatnonzero(scaled < 1.0).tolist()
+    large = np.flatnonzero(scaled >= 1.0).tolist()
+    scaled = scaled.tolist()
+    while small and large:
+        s, l = small.pop(), large.pop()
+        prob[s] = scaled[s]
+        alias[s] = l
+        scaled[l] = (scaled[l] + scaled[s]) - 1.0
+        if scaled[l] < 1.0:
+            small.append(l)
+        else:
+            large.append(l)
+    # 剩余格子（浮点误差）概率为 1
+    return prob, alias
+
+
+def build_file_index(data):
+    """
+    扫描文件内容，返回非空行的 (起始偏移, 结束偏移, 权重) 数组，文件中没有权重时权重为 None
+
+    按块处理：每块求出换行位置，并用 reduceat 按行统计可见字节，整体内存占用与块大小相关
+    """
+    buffer = np.frombuffer(data, dtype=np.uint8) if len(data) else np.zeros(0, dtype=np.uint8)
+    size = buffer.size
+    begin = 3 if bytes(buffer[:3]) == b"\xef\xbb\xbf" else 0  # 跳过 UTF-8 BOM
+
+    newlines = []
+    # 每行是否含可见字节（一定非空）/ 是否含非 ASCII 字节（不含可见字节时需解码确认）
+    has_visible, has_high = [], []
+    # 跨块的行：当前尚未结束的那一行的统计
+    open_visible = open_high = False
+    for offset in range(begin, size, FILE_INDEX_CHUNK):
+        chunk = buffer[offset:offset + FILE_INDEX_CHUNK]
+        chunk_newlines = np.flatnonzero(chunk == 10)
+        segments = np.concatenate(([0], chunk_newlines + 1))
+        segments = segments[segments < chunk.size]
+
+        visible = np.zeros(chunk_newlines.size + 1, dtype=bool)
+        high = np.zeros(chunk_newlines.size + 1, dtype=bool)
+        visible[:segments.size] = np.logical_or.reduceat(_VISIBLE_BYTES[chunk], segments)
+        high[:segments.size] = np.logical_or.reduceat(chunk >= 128, segments)
+
+        # 块的第一段接续上一块未结束的行，最后一段留给下一块
+        visible[0] |= open_visible
+        high[0] |= open_high
+        open_visible, open_high = visible[-1], high[-1]
+        has_visible.append(visible[:-1])
+        has_high.append(high[:-1])
+        newlines.append(chunk_newlines + offset)
+
+    newlines = np.concatenate(newlines) if newlines else np.zeros(0, dtype=np.int64)
+    has_visible = np.concatenate(has_visible + [[open_visible]])
+    has_high = np.concatenate(has_high + [[open_high]])
+    line_starts = np.concatenate(([begin], newlines + 1)).astype(np.int64)
+    line_ends = np.concatenate((newlines, [size])).astype(np.int64)
+
+    # 可能只含 Unicode 空白的行（如全角空格）逐行解码确认
+    keep = has_visible.copy()
+    for i in np.flatnonzero(has_high & ~has_visible).tolist():
+        line = bytes(buffer[line_starts[i]:line_ends[i]]).decode("utf-8", errors="replace")
+        keep[i] = line.strip() != ""
+
+    starts = line_starts[keep]
+    ends = line_ends[keep]
+    # \r\n 换行：去掉行尾的 \r
+    if size:
+        ends = ends - ((ends > starts) & (buffer[np.maximum(ends - 1, 0)] == 13))
+
+    weights = None
+    if data.find(b"::") != -1:
+        # 有权重写法时逐行解析一次（结果随索引保存），行尾偏移改为权重之前
+        lines = [bytes(data[a:b]).decode("utf-8", errors="replace") for a, b in zip(starts.tolist(), ends.tolist())]
+        weight_list, keep_list = [], []
+        has_weight = False
+        for i, ln in enumerate(lines):
+            match = WEIGHT_SUFFIX.search(ln)
+            if match:
+                has_weight = True
+                text = ln[:match.start()]
+                if text.strip() == "":
+                    continue
+                ends[i] -= len(ln[match.start():].encode("utf-8"))
+                weight_list.append(float(match.group(1)))
+            else:
+                weight_list.append(1.0)
+            keep_list.append(i)
+        if has_weight:
+            starts, ends = starts[keep_list], ends[keep_list]
+            if sum(weight_list) > 0:
+                weights = np.asarray(weight_list, dtype=np.float64)
+    return starts, ends, weights
+
+
+def load_or_build_file_index(path, size, mtime_ns):
+    """读取库文件旁的索引；不存在或已过期时内存映射库文件重新建立并尝试保存"""
+    index_path = path + FILE_INDEX_SUFFIX
+    try:
+        with np.load(index_path) as saved:
+            if (int(saved["version"]) == FILE_INDEX_VERSION and int(saved["size"]) == size
+                    and int(saved["mtime_ns"]) == mtime_ns):
+                weights = saved["weights"]
+                return saved["starts"], saved["ends"], (weights if weights.size else None)
+    except (OSError, KeyError, ValueError):
+        pass
+
+    if size:
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            starts, ends, weights = build_file_index(data)
+    else:
+        starts, ends, weights = build_file_index(b"")
+    try:
+        temp_path = index_path + ".tmp.npz"
+        np.savez(temp_path, version=FILE_INDEX_VERSION, size=size, mtime_ns=mtime_ns, starts=starts, ends=ends,
+                 weights=weights if weights is not None else np.zeros(0, dtype=np.float64))
+        os.replace(temp_path, index_path)
+    except OSError as e:
+        # 目录不可写时只保留内存中的索引
+        print(f"[提示词库] 无法保存行索引 {index_path}: {e}")
+    return starts, ends, weights
+
+
+def get_file_line_index(path):
+    """
+    获取提示词库文件的行索引（进程级缓存，文件大小或修改时间变化后重建）
+    """
+    path = os.path.realpath(path)
+    stat = os.stat(path)
+    key = ("file", path, stat.st_size, stat.st_mtime_ns)
+    with _line_index_lock:
+        index = _line_index_cache.get(key)
+        if index is not None:
+            _line_index_cache.move_to_end(key)
+            return index
+
+    index = FilePromptLineIndex(path, stat.st_size, stat.st_mtime_ns)
+
+    with _line_index_lock:
+        _line_index_cache[key] = index
+        _line_index_cache.move_to_end(key)
+        while len(_line_index_cache) > LINE_INDEX_CACHE_SIZE:
+            _line_index_cache.popitem(last=False)
+    return index
+
+
+def unrank_combination(index, sizes):
+    """
+    混合进制展开：把组合序号转换为每个输入的行号（最后一个输入变化最快）
+    """
+    digits = []
+    for size in reversed(sizes):
+        index, digit = divmod(index, size)
+        digits.append(digit)
+    digits.reverse()
+    return digits
+
+
+class IndexPermutation:
+    """
+    [0, total) 上由种子决定的伪随机排列（不放回），按需计算单个位置，不生成整个排列
+
+    说明：
+    - 在 2 的偶数次幂大小的域上做 4 轮 Feistel 置换，结果超出 total 时继续置换（cycle walking），
+      因此对任意 total 都是一一映射
+    - total 可以是任意大的整数（如多个输入行数的乘积）
+    """
+
+    ROUNDS = 4
+
+    def __init__(self, total, seed):
+        self.total = total
+        half_bits = max(1, ((total - 1).bit_length() + 1) // 2)
+        self.half_bits = half_bits
+        self.half_mask = (1 << half_bits) - 1
+        self.digest_size = min(64, (half_bits + 7) // 8 + 1)
+        self.keys = [hashlib.blake2b(f"{seed}:{r}".encode(), digest_size=16).digest() for r in range(self.ROUNDS)]
+
+    def _round(self, value, key):
+        digest = hashlib.blake2b(value.to_bytes(64, "little"), digest_size=self.digest_size, key=key).digest()
+        return int.from_bytes(digest, "little") & self.half_mask
+
+    def __getitem__(self, position):
+        value = position
+        while True:
+            left, right = value >> self.half_bits, value & self.half_mask
+            for key in self.keys:
+                left, right = right, left ^ self._round(right, key)
+            value = (left << self.half_bits) | right
+            if value < self.total:
+                return value
+
+
+def get_line_index(text):
+    """
+    获取文本对应的行索引（进程级缓存，按文本哈希命中）
+
+    以文本本身为字典键：命中只需一次字符串哈希与比较（C 层完成），
+    不需要另外编码、计算摘要
+    """
+    key = text
+    with _line_index_lock:
+        index = _line_index_cache.get(key)
+        if index is not None:
+            _line_index_cache.move_to_end(key)
+            return index
+
+    index = PromptLineIndex(text)
+
+    with _line_index_lock:
+        _line_index_cache[key] = index
+        _line_index_cache.move_to_end(key)
+        while len(_line_index_cache) > LINE_INDEX_CACHE_SIZE:
+            _line_index_cache.popitem(last=False)
+    return index
@@ -0,0 +1,146 @@
+import re
+import unicodedata
+
+import numpy as np
+
+# 字符串预处理选项（随机提示词行提取 / 组合节点共用）
+PREPROCESS_OPTIONS = [
+    "不改变",
+    "取数字",
+    "取字母",
+    "转大写",
+    "转小写",
+    "取中文",
+    "去标点",
+    "去换行",
+    "去空行",
+    "去空格",
+    "去格式",
+    "统计字数",
+]
+
+# 字符类标记（可按位组合）
+_PUNCT = 1      # Unicode 标点 (P*)
+_SPACE = 2      # 空格分隔符 (Zs) 与制表符
+_DIGIT = 4      # str.isdigit() 为真的字符
+_LETTER = 8     # ASCII 字母
+_CHINESE = 16   # 基本汉字 U+4E00..U+9FFF
+_NEWLINE = 32   # 换行符
+
+# 字符类扫描范围：当前 Unicode 版本中标点、数字、空格分隔符均位于 0 号与 1 号平面，
+# 只扫描这部分可把导入开销控制在几十毫秒
+_CHAR_SCAN_LIMIT = 0x20000
+
+# 文本长度达到该值时改用 numpy 查表（短文本用编译好的正则更快）
+_VECTOR_MIN_LENGTH = 4096
+
+
+def _build_char_classes():
+    """构建覆盖全部码位的字符类表，每个码位一个字节的标记位"""
+    table = np.zeros(0x110000, dtype=np.uint8)
+    chars = [chr(cp) for cp in range(_CHAR_SCAN_LIMIT)]
+    categories = list(map(unicodedata.category, chars))
+    table[[cp for cp, cat in enumerate(categories) if cat[0] == "P"]] |= _PUNCT
+    table[[cp for cp, cat in enumerate(categories) if cat == "Zs"] + [ord("\t")]] |= _SPACE
+    table[[cp for cp, ch in enumerate(chars) if ch.isdigit()]] |= _DIGIT
+    table[ord("A"):ord("Z") + 1] |= _LETTER
+    table[ord("a"):ord("z") + 1] |= _LETTER
+    table[0x4E00:0x9FFF + 1] |= _CHINESE
+    table[ord("\n")] |= _NEWLINE
+    return table
+
+
+_CHAR_CLASSES = _build_char_classes()
+
+
+def _char_class(codepoints):
+    """把码位列表压缩为正则字符类内容（连续码位合并为区间）"""
+    parts = []
+    start = prev = None
+    for cp in codepoints:
+        if prev is not None and cp == prev + 1:
+            prev = cp
+            continue
+        if start is not None:
+            parts.append(_char_range(start, prev))
+        start = prev = cp
+    if start is not None:
+        parts.append(_char_range(start, prev))
+    return "".join(parts)
+
+
+def _char_range(start, end):
+    if start == end:
+        return re.escape(chr(start))
+    return f"{re.escape(chr(start))}-{re.escape(chr(end))}"
+
+
+class _CharFilter:
+    """
+    按字符类删除（或只保留）字符
+
+    - ASCII 文本：bytes.translate 的删除表，一次 C 级扫描
+    - 短文本：预编译的正则，按连续字符段删除
+    - 长文本：UTF-32 码位数组查 _CHAR_CLASSES 表，整段向量化过滤
+    """
+
+    def __init__(self, flags, keep):
+        self.flags = flags
+        self.keep = keep
+        selected = np.flatnonzero(_CHAR_CLASSES & flags).tolist()
+        if keep:
+            self.pattern = re.compile(f"[^{_char_class(selected)}]+")
+            self.ascii_delete = bytes(c for c in range(128) if c not in selected)
+        else:
+            self.pattern = re.compile(f"[{_char_class(selected)}]+")
+            self.ascii_delete = bytes(c for c in selected if c < 128)
+
+    def __call__(self, text):
+        if text.isascii():
+            return text.encode("ascii").translate(None, self.ascii_delete).decode("ascii")
+        if len(text) < _VECTOR_MIN_LENGTH:
+            return self.pattern.sub("", text)
+        codepoints = np.frombuffer(text.encode("utf-32-le", "surrogatepass"), dtype="<u4")
+        hit = (_CHAR_CLASSES[codepoints] & self.flags) != 0
+        return codepoints[hit if self.keep else ~hit].tobytes().decode("utf-32-le", "surrogatepass")
+
+
+_KEEP_DIGITS = _CharFilter(_DIGIT | _NEWLINE, keep=True)
+_KEEP_LETTERS = _CharFilter(_LETTER | _NEWLINE, keep=True)
+_KEEP_CHINESE = _CharFilter(_CHINESE | _NEWLINE, keep=True)
+_REMOVE_PUNCTUATION = _CharFilter(_PUNCT, keep=False)
+_REMOVE_SPACES = _CharFilter(_SPACE, keep=False)
+
+_WHITESPACE_RUN = re.compile(r"\s+")
+
+
+def count_nonspace_chars(text: str) -> int:
+    """非空白字符数（str.split 的空白定义与 str.isspace 一致）"""
+    return sum(map(len, text.split()))
+
+
+def apply_preprocess(text: str, option: str) -> str:
+    if option == "不改变":
+        return text
+    if option == "取数字":
+        return _KEEP_DIGITS(text)
+    if option == "取字母":
+        return _KEEP_LETTERS(text)
+    if option == "转大写":
+        return text.upper()
+    if option == "转小写":
+        return text.lower()
+    if option == "取中文":
+        return _KEEP_CHINESE(text)
+    if option == "去标点":
+        return _REMOVE_PUNCTUATION(text)
+    if option == "去换行":
+        return text.replace("\r\n", "").replace("\n", "").replace("\r", "")
+    if option == "去空行":
+        return "\n".join(ln for ln in text.splitlines() if ln.strip() != "")
+    if option == "去空格":
+        return _REMOVE_SPACES(text)
+    if option == "去格式":
+        normalized_lines = (_WHITESPACE_RUN.sub(" ", ln).strip() for ln in text.splitlines())
+        return "\n".join(ln for ln in normalized_lines if ln != "")
+    return text
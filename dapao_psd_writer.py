@@ -0,0 +1,206 @@
+import struct
+import numpy as np
+
+# PSD (version 1) 单边最大像素
+PSD_MAX_SIDE = 30000
+
+# 每个图层固定写入的通道：透明度 + RGB
+LAYER_CHANNEL_IDS = (-1, 0, 1, 2)
+
+
+def packbits_encode_rows(rows):
+    """
+    PackBits(RLE) 行编码，整块数组一次性完成
+
+    参数：
+    - rows: [N, W] 的 uint8 数组，每一行单独编码（行与行之间的游程互不合并）
+
+    返回：
+    - data: 所有行编码结果按顺序拼接的 uint8 数组
+    - lengths: 每一行编码后的字节数 (int64, 长度 N)
+
+    说明：
+    - 游程边界通过相邻字节比较一次性求出，不在 Python 里逐字节循环
+    - 长度 >= 3 的游程写为重复块，其余字节合并为字面块，每块最多 128 字节
+    """
+    rows = np.ascontiguousarray(rows, dtype=np.uint8)
+    if rows.ndim != 2:
+        raise ValueError("packbits_encode_rows: rows must be a 2D uint8 array")
+
+    num_rows, width = rows.shape
+    if num_rows == 0 or width == 0:
+        return np.zeros((0,), dtype=np.uint8), np.zeros((num_rows,), dtype=np.int64)
+
+    flat = rows.ravel()
+    total = flat.size
+
+    # 1. 游程起点：值发生变化的位置 + 每行行首
+    is_start = np.empty(total, dtype=bool)
+    is_start[0] = True
+    np.not_equal(flat[1:], flat[:-1], out=is_start[1:])
+    is_start[::width] = True
+
+    run_starts = np.flatnonzero(is_start)
+    run_lens = np.diff(np.append(run_starts, total))
+    run_is_rep = run_lens >= 3
+
+    # 2. 合并相邻的字面游程为字面段（不跨行）；重复游程各自成段
+    seg_flag = np.empty(run_starts.size, dtype=bool)
+    seg_flag[0] = True
+    seg_flag[1:] = run_is_rep[1:] | run_is_rep[:-1]
+    seg_flag |= (run_starts % width) == 0
+
+    seg_first_run = np.flatnonzero(seg_flag)
+    seg_pos = run_starts[seg_first_run]
+    seg_len = np.add.reduceat(run_lens, seg_first_run)
+    seg_is_rep = run_is_rep[seg_first_run]
+
+    # 3. 每段按 128 字节切块
+    seg_chunks = (seg_len + 127) // 128
+    chunk_seg = np.repeat(np.arange(seg_len.size), seg_chunks)
+    chunk_first = np.cumsum(seg_chunks) - seg_chunks
+    chunk_k = np.arange(chunk_seg.size) - np.repeat(chunk_first, seg_chunks)
+    chunk_pos = seg_pos[chunk_seg] + chunk_k * 128
+    chunk_len = np.minimum(seg_len[chunk_seg] - chunk_k * 128, 128)
+    chunk_is_rep = seg_is_rep[chunk_seg]
+
+    # 4. 计算输出布局：1 字节块头 + 数据（重复块 1 字节，字面块 n 字节）
+    chunk_size = 1 + np.where(chunk_is_rep, 1, chunk_len)
+    chunk_out = np.cumsum(chunk_size) - chunk_size
+    data = np.empty(int(chunk_size.sum()), dtype=np.uint8)
+
+    header = np.where(chunk_is_rep, 257 - chunk_len, chunk_len - 1)
+    data[chunk_out] = header.astype(np.uint8)
+
+    rep_out = chunk_out[chunk_is_rep] + 1
+    data[rep_out] = flat[chunk_pos[chunk_is_rep]]
+
+    # 字面字节在输入与输出中保持相同顺序，用掩码一次性搬运
+    literal_dst = np.ones(data.size, dtype=bool)
+    literal_dst[chunk_out] = False
+    literal_dst[rep_out] = False
+    literal_src = np.repeat(~run_is_rep, run_lens)
+    data[literal_dst] = flat[literal_src]
+
+    lengths = np.bincount(chunk_pos // width, weights=chunk_size, minlength=num_rows).astype(np.int64)
+    return data, lengths
+
+
+def _pascal_name(name):
+    """图层名：Pascal 字符串，总长度按 4 字节对齐"""
+    raw = name.encode("latin-1", errors="replace")[:255]
+    data = bytes([len(raw)]) + raw
+    return data + b"\x00" * (-len(data) % 4)
+
+
+def _layer_record_size(name):
+    # 边界 16 + 通道数 2 + 每通道 6 + 混合信息 12 + 附加数据长度 4 + 遮罩/混合范围长度 8 + 名称
+    return 16 + 2 + 6 * len(LAYER_CHANNEL_IDS) + 12 + 4 + 8 + len(_pascal_name(name))
+
+
+def _write_layer_record(fd, name, top, left, bottom, right, channel_lengths):
+    fd.write(struct.pack(">iiiiH", top, left, bottom, right, len(LAYER_CHANNEL_IDS)))
+    for channel_id, length in zip(LAYER_CHANNEL_IDS, channel_lengths):
+        fd.write(struct.pack(">hI", channel_id, length))
+    # 普通混合、不透明度 255、无剪贴、flags=8（与 pytoshop 输出一致）
+    fd.write(b"8BIMnorm" + struct.pack(">BBBB", 255, 0, 8, 0))
+    pascal_name = _pascal_name(name)
+    fd.write(struct.pack(">III", 8 + len(pascal_name), 0, 0))
+    fd.write(pascal_name)
+
+
+def _write_channel(fd, plane):
+    """
+    写入单个通道（RLE 压缩），返回写入的字节数
+
+    plane 可以是任意步长的 uint8 视图；行步长为 0 的广播视图（如常量透明度）
+    只编码一行，其余行直接复用
+    """
+    height, width = plane.shape
+    if height == 0 or width == 0:
+        fd.write(struct.pack(">H", 0))
+        return 2
+
+    if plane.strides[0] == 0:
+        data, lengths = packbits_encode_rows(plane[:1])
+        packed = data.tobytes()
+        fd.write(struct.pack(">H", 1))
+        fd.write(np.full((height,), lengths[0], dtype=">u2").tobytes())
+        for _ in range(height):
+            fd.write(packed)
+        return 2 + 2 * height + len(packed) * height
+
+    data, lengths = packbits_encode_rows(plane)
+    fd.write(struct.pack(">H", 1))
+    fd.write(lengths.astype(">u2").tobytes())
+    fd.write(data.tobytes())
+    return 2 + 2 * height + data.size
+
+
+def write_layered_psd(fd, size, names, layers):
+    """
+    流式写入 RGB 分层 PSD，内存峰值约为单个图层
+
+    参数：
+    - fd: 可 seek 的二进制文件对象
+    - size: 画布尺寸 (width, height)
+    - names: 图层名列表，顺序为从底层到顶层
+    - layers: 与 names 顺序一致的可迭代对象，每项为 (top, left, planes)，
+      planes 为按 LAYER_CHANNEL_IDS 顺序排列的 4 个 [h, w] uint8 数组/视图。
+      可以是生成器，每次只准备一个图层
+
+    说明：
+    - 图层记录的大小只取决于名称，先预留位置，逐层写完通道数据后再回填
+    - 合成图写为全黑常量（与原 pytoshop 输出一致）
+    """
+    width, height = size
+    if width > PSD_MAX_SIDE or height > PSD_MAX_SIDE:
+        raise ValueError(f"PSD canvas {width}x{height} exceeds the {PSD_MAX_SIDE}px limit")
+
+    # 文件头：版本 1，3 通道，8 位，RGB 颜色模式
+    fd.write(struct.pack(">4sH6sHIIHH", b"8BPS", 1, b"", 3, height, width, 8, 3))
+    # 颜色模式数据、图像资源：均为空
+    fd.write(struct.pack(">II", 0, 0))
+
+    layer_mask_pos = fd.tell()
+    fd.write(struct.pack(">II", 0, 0))
+    layer_info_start = fd.tell()
+    fd.write(struct.pack(">h", len(names)))
+
+    # 预留图层记录
+    records_pos = fd.tell()
+    fd.write(b"\x00" * sum(_layer_record_size(name) for name in names))
+
+    records = []
+    for name, (top, left, planes) in zip(names, layers):
+        layer_h, layer_w = planes[0].shape
+        channel_lengths = [_write_channel(fd, plane) for plane in planes]
+        records.append((name, top, left, top + layer_h, left + layer_w, channel_lengths))
+
+    if len(records) != len(names):
+        raise ValueError("write_layered_psd: layers ended before all names were written")
+
+    # 图层信息长度按 2 字节对齐
+    layer_info_end = fd.tell()
+    if (layer_info_end - layer_info_start) % 2:
+        fd.write(b"\x00")
+        layer_info_end += 1
+    # 全局图层遮罩信息：空
+    fd.write(struct.pack(">I", 0))
+    layer_mask_end = fd.tell()
+
+    # 回填图层记录与各段长度
+    fd.seek(records_pos)
+    for record in records:
+        _write_layer_record(fd, *record)
+    fd.seek(layer_mask_pos)
+    fd.write(struct.pack(">II", layer_mask_end - layer_mask_pos - 4, layer_info_end - layer_info_start))
+    fd.seek(layer_mask_end)
+
+    # 合成图：3 个通道的全黑常量，按 RGB 顺序依次写入所有行
+    data, lengths = packbits_encode_rows(np.zeros((1, width), dtype=np.uint8))
+    packed = data.tobytes()
+    fd.write(struct.pack(">H", 1))
+    fd.write(np.full((3 * height,), lengths[0], dtype=">u2").tobytes())
+    for _ in range(3 * height):
+        fd.write(packed)
@@ -1,7 +1,15 @@
 import random
-import re
 import secrets
-import unicodedata
+
+from .dapao_prompt_lines import IndexPermutation, get_line_index, unrank_combination
+from .dapao_prompt_preprocess import PREPROCESS_OPTIONS, apply_preprocess, count_nonspace_chars
+
+
+# 组合模式：随机抽取（原有行为）/ 按序号顺序枚举 / 按种子打乱后不放回枚举
+COMBINE_MODES = ["随机抽取", "顺序枚举", "随机枚举"]
+
+# 起始序号上限：前端数字控件是 JavaScript 数值，超过 2^53 - 1 会被静默舍入，翻页会落到错误的组合
+MAX_COMBINATION_OFFSET = 0x1FFFFFFFFFFFFF
 
 
 class DapaoRandomPromptLineCombineNode:
@@ -11,32 +19,20 @@ class DapaoRandomPromptLineCombineNode:
 
     @classmethod
     def INPUT_TYPES(cls):
-        preprocess_options = [
-            "不改变",
-            "取数字",
-            "取字母",
-            "转大写",
-            "转小写",
-            "取中文",
-            "去标点",
-            "去换行",
-            "去空行",
-            "去空格",
-            "去格式",
-            "统计字数",
-        ]
-
         inputs = {
             "required": {
-                "🧰 字符串预处理": (preprocess_options, {"default": "不改变"}),
+                "🧰 字符串预处理": (PREPROCESS_OPTIONS, {"default": "不改变"}),
                 "🔢 提取行数": ("INT", {"default": 1, "min": 1, "max": 9999, "step": 1}),
                 "🎲 随机种子": ("INT", {"default": 0, "min": 0, "max": 0x7FFFFFFF, "step": 1}),
             },
-            "optional": {},
+            "optional": {
+                "🧮 组合模式": (COMBINE_MODES, {"default": "随机抽取", "tooltip": "枚举模式把各输入的行视为笛卡尔积，按序号取组合，不重复"}),
+                "⏩ 起始序号": ("INT", {"default": 0, "min": 0, "max": MAX_COMBINATION_OFFSET, "step": 1, "tooltip": "枚举模式下从第几个组合开始，配合提取行数分页；随机枚举需固定种子。最大 2^53-1（前端可精确表示的最大整数）"}),
+            },
         }
 
         for i in range(1, 11):
-            inputs["optional"][f"📝 提示词行{i}"] = ("STRING", {"default": "", "multiline": True})
+            inputs["optional"][f"📝 提示词行{i}"] = ("STRING", {"default": "", "multiline": True, "tooltip": "每行一个候选，行尾可写 ::权重（如 猫::3.5）"})
 
         return inputs
 
@@ -46,46 +42,14 @@ class DapaoRandomPromptLineCombineNode:
     FUNCTION = "combine"
     CATEGORY = "🤖Dapao-Toolbox/🗼字符串处理"
 
-    def _remove_punctuation(self, text: str) -> str:
-        return "".join(ch for ch in text if not unicodedata.category(ch).startswith("P"))
-
-    def _count_nonspace_chars(self, text: str) -> int:
-        return sum(1 for ch in text if not ch.isspace())
-
-    def _apply_preprocess(self, text: str, option: str) -> str:
-        if option == "不改变":
-            return text
-        if option == "取数字":
-            return "".join(ch for ch in text if ch.isdigit() or ch == "\n")
-        if option == "取字母":
-            return "".join(ch for ch in text if ("A" <= ch <= "Z") or ("a" <= ch <= "z") or ch == "\n")
-        if option == "转大写":
-            return text.upper()
-        if option == "转小写":
-            return text.lower()
-        if option == "取中文":
-            return "".join(ch for ch in text if ("\u4e00" <= ch <= "\u9fff") or ch == "\n")
-        if option == "去标点":
-            return self._remove_punctuation(text)
-        if option == "去换行":
-            return text.replace("\r\n", "").replace("\n", "").replace("\r", "")
-        if option == "去空行":
-            return "\n".join(ln for ln in text.splitlines() if ln.strip() != "")
-        if option == "去空格":
-            return "".join(ch for ch in text if (unicodedata.category(ch) != "Zs" and ch != "\t"))
-        if option == "去格式":
-            normalized_lines = []
-            for ln in text.splitlines():
-                normalized = re.sub(r"\s+", " ", ln.replace("\t", " ").replace("\r", " ")).strip()
-                if normalized != "":
-                    normalized_lines.append(normalized)
-            return "\n".join(normalized_lines)
-        return text
-
-    def _pick_lines_in_order(self, rng: random.Random, lines: list[str], pick_count: int) -> list[str]:
+    def _pick_indices_in_order(self, rng: random.Random, lines, pick_count: int) -> list[int]:
         if not lines:
             return []
 
+        if lines.weights is not None:
+            # 行尾写了 ::权重 时按权重抽取（别名表，每次抽取 O(1)）
+            return lines.sample_weighted(rng, pick_count)
+
         if pick_count <= 1:
             indices = [rng.randrange(len(lines))]
         else:
@@ -96,17 +60,38 @@ class DapaoRandomPromptLineCombineNode:
                 remaining = pick_count - len(lines)
                 indices.extend(rng.randrange(len(lines)) for _ in range(remaining))
 
-        return [lines[i] for i in sorted(indices)]
+        return sorted(indices)
 
-    def _pick_one_line(self, rng: random.Random, lines: list[str]) -> str:
+    def _pick_one_line(self, rng: random.Random, lines) -> str:
         if not lines:
             return ""
-        return lines[rng.randrange(len(lines))]
+        if lines.weights is not None:
+            return lines.lines[lines.draw_weighted(rng)]
+        return lines.lines[rng.randrange(len(lines))]
+
+    def _enumerate_combinations(self, sizes, mode, offset, count, seed):
+        """
+        枚举模式：取第 offset 起的 count 个组合，返回每个组合各输入的行号
+
+        组合总数为各输入行数的乘积，只按需展开被取到的序号，不生成全部组合
+        """
+        total = 1
+        for size in sizes:
+            total *= size
+        if offset >= total:
+            return []
+        positions = range(offset, min(offset + count, total))
+        if mode == "随机枚举":
+            permutation = IndexPermutation(total, seed)
+            return [unrank_combination(permutation[p], sizes) for p in positions]
+        return [unrank_combination(p, sizes) for p in positions]
 
     def combine(self, **kwargs):
         option = str(kwargs.get("🧰 字符串预处理", "不改变"))
         pick_count = int(kwargs.get("🔢 提取行数", 1))
         seed = int(kwargs.get("🎲 随机种子", 0))
+        mode = str(kwargs.get("🧮 组合模式", "随机抽取"))
+        offset = min(max(int(kwargs.get("⏩ 起始序号", 0)), 0), MAX_COMBINATION_OFFSET)
 
         input_texts = []
         for i in range(1, 11):
@@ -120,22 +105,39 @@ class DapaoRandomPromptLineCombineNode:
         if not input_texts:
             return ([], 0)
 
-        rng = random.Random(seed if seed != 0 else secrets.randbelow(0x7FFFFFFF))
+        seed_value = seed if seed != 0 else secrets.randbelow(0x7FFFFFFF)
+        rng = random.Random(seed_value)
 
-        input_lines_list = []
-        if len(input_texts) == 1:
-            lines = [ln for ln in input_texts[0].splitlines() if ln.strip() != ""]
-            input_lines_list.append(lines)
-        else:
-            for text in input_texts:
-                lines = [ln for ln in text.splitlines() if ln.strip() != ""]
-                input_lines_list.append(lines)
+        # 拆分、过滤后的行按文本哈希缓存，重复执行只做抽样
+        input_lines_list = [get_line_index(text) for text in input_texts]
 
         prompts = []
-        if len(input_lines_list) == 1:
-            picked = self._pick_lines_in_order(rng, input_lines_list[0], pick_count)
-            for ln in picked:
-                prompts.append(ln)
+        processed_prompts = None
+        if mode in ("顺序枚举", "随机枚举"):
+            active_inputs = [lines for lines in input_lines_list if len(lines) > 0]
+            if not active_inputs:
+                return ([], 0)
+
+            combinations = self._enumerate_combinations(
+                [len(lines) for lines in active_inputs], mode, offset, pick_count, seed_value
+            )
+            if len(active_inputs) == 1:
+                lines = active_inputs[0]
+                picked_indices = [digits[0] for digits in combinations]
+                prompts = lines.get_lines(picked_indices)
+                if option != "统计字数":
+                    processed_prompts = lines.get_processed(picked_indices, option, apply_preprocess)
+            else:
+                for digits in combinations:
+                    parts = [lines.get_lines([d])[0] for lines, d in zip(active_inputs, digits)]
+                    prompts.append(", ".join(parts))
+        elif len(input_lines_list) == 1:
+            lines = input_lines_list[0]
+            picked_indices = self._pick_indices_in_order(rng, lines, pick_count)
+            prompts = lines.get_lines(picked_indices)
+            if option != "统计字数":
+                # 单输入时每条提示词就是一行，可直接使用缓存的预处理结果
+                processed_prompts = lines.get_processed(picked_indices, option, apply_preprocess)
         else:
             active_inputs = [lines for lines in input_lines_list if len(lines) > 0]
             if not active_inputs:
@@ -148,12 +150,13 @@ class DapaoRandomPromptLineCombineNode:
                 prompts.append(", ".join(parts))
 
         if option == "统计字数":
-            counts = [self._count_nonspace_chars(p) for p in prompts]
+            counts = [count_nonspace_chars(p) for p in prompts]
             total = sum(counts)
             return ([str(c) for c in counts], total)
 
-        processed_prompts = [self._apply_preprocess(p, option) for p in prompts]
-        total_chars = self._count_nonspace_chars("\n".join(processed_prompts))
+        if processed_prompts is None:
+            processed_prompts = [apply_preprocess(p, option) for p in prompts]
+        total_chars = count_nonspace_chars("\n".join(processed_prompts))
         return (processed_prompts, total_chars)
 
 
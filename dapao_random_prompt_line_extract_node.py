@@ -1,7 +1,9 @@
+import os
 import random
-import re
 import secrets
-import unicodedata
+
+from .dapao_prompt_lines import get_file_line_index, get_line_index
+from .dapao_prompt_preprocess import PREPROCESS_OPTIONS, apply_preprocess, count_nonspace_chars
 
 
 class DapaoRandomPromptLineExtractNode:
@@ -11,28 +13,16 @@ class DapaoRandomPromptLineExtractNode:
 
     @classmethod
     def INPUT_TYPES(cls):
-        preprocess_options = [
-            "不改变",
-            "取数字",
-            "取字母",
-            "转大写",
-            "转小写",
-            "取中文",
-            "去标点",
-            "去换行",
-            "去空行",
-            "去空格",
-            "去格式",
-            "统计字数",
-        ]
-
         return {
             "required": {
-                "📝 多行文本": ("STRING", {"default": "", "multiline": True, "tooltip": "每行一个候选提示词"}),
-                "🧰 字符串预处理": (preprocess_options, {"default": "不改变"}),
+                "📝 多行文本": ("STRING", {"default": "", "multiline": True, "tooltip": "每行一个候选提示词，行尾可写 ::权重（如 猫::3.5）"}),
+                "🧰 字符串预处理": (PREPROCESS_OPTIONS, {"default": "不改变"}),
                 "🔢 提取行数": ("INT", {"default": 1, "min": 1, "max": 9999, "step": 1}),
                 "🎲 随机种子": ("INT", {"default": 0, "min": 0, "max": 0x7FFFFFFF, "step": 1}),
-            }
+            },
+            "optional": {
+                "📂 提示词库文件": ("STRING", {"default": "", "tooltip": "文本文件路径，每行一个候选提示词；填写后忽略多行文本，大词库不再写入工作流"}),
+            },
         }
 
     RETURN_TYPES = ("STRING", "INT")
@@ -41,56 +31,31 @@ class DapaoRandomPromptLineExtractNode:
     FUNCTION = "extract"
     CATEGORY = "🤖Dapao-Toolbox/🗼字符串处理"
 
-    def _remove_punctuation(self, text: str) -> str:
-        return "".join(ch for ch in text if not unicodedata.category(ch).startswith("P"))
-
-    def _count_nonspace_chars(self, text: str) -> int:
-        return sum(1 for ch in text if not ch.isspace())
-
-    def _apply_preprocess(self, text: str, option: str) -> str:
-        if option == "不改变":
-            return text
-        if option == "取数字":
-            return "".join(ch for ch in text if ch.isdigit() or ch == "\n")
-        if option == "取字母":
-            return "".join(ch for ch in text if ("A" <= ch <= "Z") or ("a" <= ch <= "z") or ch == "\n")
-        if option == "转大写":
-            return text.upper()
-        if option == "转小写":
-            return text.lower()
-        if option == "取中文":
-            return "".join(ch for ch in text if ("\u4e00" <= ch <= "\u9fff") or ch == "\n")
-        if option == "去标点":
-            return self._remove_punctuation(text)
-        if option == "去换行":
-            return text.replace("\r\n", "").replace("\n", "").replace("\r", "")
-        if option == "去空行":
-            return "\n".join(ln for ln in text.splitlines() if ln.strip() != "")
-        if option == "去空格":
-            return "".join(ch for ch in text if (unicodedata.category(ch) != "Zs" and ch != "\t"))
-        if option == "去格式":
-            normalized_lines = []
-            for ln in text.splitlines():
-                normalized = re.sub(r"\s+", " ", ln.replace("\t", " ").replace("\r", " ")).strip()
-                if normalized != "":
-                    normalized_lines.append(normalized)
-            return "\n".join(normalized_lines)
-        return text
-
     def extract(self, **kwargs):
         text = str(kwargs.get("📝 多行文本", ""))
         option = str(kwargs.get("🧰 字符串预处理", "不改变"))
         pick_count = int(kwargs.get("🔢 提取行数", 1))
         seed = int(kwargs.get("🎲 随机种子", 0))
+        library_path = str(kwargs.get("📂 提示词库文件", "") or "").strip().strip('"').strip("'")
 
-        lines = [ln for ln in text.splitlines() if ln.strip() != ""]
+        if library_path:
+            # 提示词库文件：内存映射 + 行偏移索引，只读取被抽中的行
+            if not os.path.isfile(library_path):
+                raise ValueError(f"❌ 错误：提示词库文件不存在 -> {library_path}")
+            lines = get_file_line_index(library_path)
+        else:
+            # 拆分、过滤后的行按文本哈希缓存，重复执行只做抽样
+            lines = get_line_index(text)
 
         if not lines:
             return ("", 0)
 
         rng = random.Random(seed if seed != 0 else secrets.randbelow(0x7FFFFFFF))
 
-        if pick_count <= 1:
+        if lines.weights is not None:
+            # 行尾写了 ::权重 时按权重抽取（别名表，每次抽取 O(1)）
+            picked_indices = lines.sample_weighted(rng, pick_count)
+        elif pick_count <= 1:
             picked_indices = [rng.randrange(len(lines))]
         else:
             if pick_count <= len(lines):
@@ -100,15 +65,15 @@ class DapaoRandomPromptLineExtractNode:
                 remaining = pick_count - len(lines)
                 picked_indices.extend(rng.randrange(len(lines)) for _ in range(remaining))
 
-        picked_lines = [lines[i] for i in sorted(picked_indices)]
+        picked_indices = sorted(picked_indices)
 
         if option == "统计字数":
-            selected_text = "\n".join(picked_lines)
-            char_count = self._count_nonspace_chars(selected_text)
+            selected_text = "\n".join(lines.get_lines(picked_indices))
+            char_count = count_nonspace_chars(selected_text)
             return ([str(char_count)], char_count)
 
-        picked_processed = [self._apply_preprocess(ln, option) for ln in picked_lines]
-        char_count = self._count_nonspace_chars("\n".join(picked_processed))
+        picked_processed = lines.get_processed(picked_indices, option, apply_preprocess)
+        char_count = count_nonspace_chars("\n".join(picked_processed))
         return (picked_processed, char_count)
 
 
@@ -2,15 +2,8 @@ import torch
 import numpy as np
 import os
 import folder_paths
-from PIL import Image
 
-try:
-    import pytoshop
-    from pytoshop.user import nested_layers
-    from pytoshop.enums import ColorMode, Compression
-    PYTOSHOP_AVAILABLE = True
-except ImportError:
-    PYTOSHOP_AVAILABLE = False
+from .dapao_psd_writer import write_layered_psd
 
 class DapaoSavePSD:
     def __init__(self):
@@ -27,6 +20,7 @@ class DapaoSavePSD:
             },
             "optional": {
                 "📂 自定义路径": ("STRING", {"default": "", "tooltip": "自定义保存路径，留空则使用默认路径"}),
+                "✂️ 裁剪透明区域": ("BOOLEAN", {"default": True, "tooltip": "将带透明通道的图层裁剪到不透明内容的范围，减小文件体积"}),
             },
         }
 
@@ -40,6 +34,7 @@ class DapaoSavePSD:
         images = kwargs.get("🖼️ 图像列表")
         filename_prefix = kwargs.get("📄 文件名前缀", "dapao_psd")
         custom_path_raw = kwargs.get("📂 自定义路径", "")
+        trim_transparent = kwargs.get("✂️ 裁剪透明区域", True)
         
         # When INPUT_IS_LIST is True, all inputs are lists.
         # Ensure filename_prefix is a string.
@@ -54,25 +49,27 @@ class DapaoSavePSD:
         elif isinstance(custom_path_raw, str):
             custom_path = custom_path_raw.strip()
 
-        if not PYTOSHOP_AVAILABLE:
-            raise ImportError("DapaoSavePSD: pytoshop module not found. Please run 'pip install pytoshop' in your ComfyUI python environment.")
-            
+        if isinstance(trim_transparent, list):
+            trim_transparent = trim_transparent[0] if trim_transparent else True
+
         if images is None:
             return {}
 
-        # 1. Flatten images to PIL list
-        pil_images = []
+        # 1. Flatten images to a list of [H, W, C] tensor views (no pixel copies yet)
+        # together with each layer's content bounds (top, left, bottom, right)
+        layer_tensors = []
+        layer_bounds = []
         
         # Helper function to process single item
         def process_item(item):
             if isinstance(item, torch.Tensor):
+                # Handle single [H, W, C]
+                if item.dim() == 3:
+                    item = item.unsqueeze(0)
                  # Handle batch [B, H, W, C]
                 if item.dim() == 4:
-                    for i in range(item.shape[0]):
-                        pil_images.append(self.tensor_to_pil(item[i]))
-                # Handle single [H, W, C]
-                elif item.dim() == 3:
-                    pil_images.append(self.tensor_to_pil(item))
+                    layer_tensors.extend(item[i] for i in range(item.shape[0]))
+                    layer_bounds.extend(self.content_bounds(item, trim_transparent))
         
         # Check if input is a list (from INPUT_IS_LIST=True)
         if isinstance(images, list):
@@ -82,45 +79,29 @@ class DapaoSavePSD:
             # Fallback if somehow it's not a list
             process_item(images)
         
-        if not pil_images:
+        if not layer_tensors:
             print("DapaoSavePSD: No images to save.")
             return {}
 
-        # 2. Calculate canvas size (Max W, Max H)
-        max_w = 0
-        max_h = 0
-        for img in pil_images:
-            max_w = max(max_w, img.width)
-            max_h = max(max_h, img.height)
-            
-        # 3. Create Layers
-        layers_list = []
-        for i, img in enumerate(pil_images):
-            # Calculate centering offset
-            x = (max_w - img.width) // 2
-            y = (max_h - img.height) // 2
-            
-            # Split channels
-            # Convert to RGBA if not already
-            if img.mode != 'RGBA':
-                img = img.convert('RGBA')
-                
-            r, g, b, a = img.split()
-            channels = {
-                0: np.array(r),
-                1: np.array(g),
-                2: np.array(b),
-                -1: np.array(a)
-            }
-            
-            layer = nested_layers.Image(
-                name=f"Layer {i+1}",
-                top=y, left=x, 
-                bottom=y+img.height, right=x+img.width,
-                channels=channels
-            )
-            layers_list.append(layer)
+        # 2. Calculate canvas size (Max W, Max H) from shapes only
+        max_w = max(t.shape[1] for t in layer_tensors)
+        max_h = max(t.shape[0] for t in layer_tensors)
             
+        # 3. Layers are written bottom-up: the first input ends up as the top layer
+        order = list(range(len(layer_tensors)))[::-1]
+        names = [f"Layer {i+1}" for i in order]
+
+        def iter_layers():
+            # Only one layer is converted to uint8 at a time
+            for i in order:
+                tensor = layer_tensors[i]
+                top, left, bottom, right = layer_bounds[i]
+                # Calculate centering offset of the full image, then shift to the trimmed box
+                x = (max_w - tensor.shape[1]) // 2 + left
+                y = (max_h - tensor.shape[0]) // 2 + top
+                pixels = self.tensor_to_uint8(tensor[top:bottom, left:right])
+                yield y, x, self.split_channels(pixels)
+
         # 4. Prepare save path
         base_output_dir = self.output_dir
         if custom_path:
@@ -136,20 +117,10 @@ class DapaoSavePSD:
         file_name = f"{filename}_{counter:05}_.psd"
         file_path = os.path.join(full_output_folder, file_name)
         
-        # 5. Create PSD structure
-        # Note: size=(width, height) based on source code inspection
-        # compression=Compression.raw to avoid 'packbits' dependency/bug in pytoshop 1.2.1
-        psd = nested_layers.nested_layers_to_psd(
-            layers_list, 
-            ColorMode.rgb, 
-            size=(max_w, max_h),
-            compression=Compression.raw 
-        )
-        
-        # 6. Write file
+        # 5. Stream layer records and channel data to the file
         try:
             with open(file_path, "wb") as f:
-                psd.write(f)
+                write_layered_psd(f, (max_w, max_h), names, iter_layers())
             print(f"DapaoSavePSD: Saved {file_path}")
         except Exception as e:
             print(f"DapaoSavePSD: Error saving PSD: {e}")
@@ -157,5 +128,45 @@ class DapaoSavePSD:
             
         return {"ui": {"images": []}}
 
-    def tensor_to_pil(self, tensor):
-        return Image.fromarray(np.clip(255. * tensor.cpu().numpy().squeeze(), 0, 255).astype(np.uint8))
+    def content_bounds(self, batch, trim_transparent):
+        # Bounding boxes of alpha > 0 for a whole [B, H, W, C] batch in one pass
+        B, H, W, C = batch.shape
+        if not trim_transparent or C != 4:
+            return [(0, 0, H, W)] * B
+
+        opaque = batch[..., 3] > 0
+        rows = opaque.any(dim=2)
+        cols = opaque.any(dim=1)
+        has_content = rows.any(dim=1)
+
+        # argmax returns the first True; flipping gives the last one
+        top = rows.to(torch.uint8).argmax(dim=1)
+        bottom = H - rows.flip(1).to(torch.uint8).argmax(dim=1)
+        left = cols.to(torch.uint8).argmax(dim=1)
+        right = W - cols.flip(1).to(torch.uint8).argmax(dim=1)
+
+        bounds = torch.stack([top, left, bottom, right], dim=1)
+        # Fully transparent layers become empty layers
+        bounds = bounds * has_content.unsqueeze(1)
+        return [tuple(b) for b in bounds.cpu().tolist()]
+
+    def tensor_to_uint8(self, tensor):
+        # Quantize on the tensor's device so only uint8 pixels cross to the CPU
+        pixels = torch.clamp(255. * tensor, 0, 255).to(torch.uint8).cpu().numpy()
+        if pixels.ndim == 2:
+            pixels = pixels[:, :, None]
+        return pixels
+
+    def split_channels(self, pixels):
+        # Strided views into the [H, W, C] uint8 array, ordered (A, R, G, B)
+        h, w, c = pixels.shape
+        if c >= 3:
+            r, g, b = pixels[:, :, 0], pixels[:, :, 1], pixels[:, :, 2]
+        else:
+            r = g = b = pixels[:, :, 0]
+        if c == 4 or c == 2:
+            a = pixels[:, :, c - 1]
+        else:
+            # Broadcast view: the writer encodes one opaque row and repeats it
+            a = np.broadcast_to(np.uint8(255), (h, w))
+        return [a, r, g, b]
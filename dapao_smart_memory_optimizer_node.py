@@ -4,9 +4,11 @@ import psutil
 import torch
 from comfy.comfy_types import IO
 
+from .dapao_memory_telemetry import DEFAULT_INTERVAL, MIN_INTERVAL, TELEMETRY_FIELDS, get_memory_sampler
+
 
 class DapaoSmartMemoryOptimizerNode:
-    DESCRIPTION = "用途：显存/内存智能优化（预留显存、低内存/低显存时卸载模型、清空缓存、GC）。\n放置位置：建议放在工作流最前面；或在加载大模型/高分辨率采样前再放一个。\n直通用法：把“🔌 任意输入”接在你想触发的位置，输出端继续接回原流程，即可精确控制本节点何时执行。\n信息展示：运行后信息会直接显示在节点里（无需接信息输出端口）。\n参数说明：\n- 预留显存GB：写入 ComfyUI 的预留显存设置，给系统/其它程序留显存；越大越稳，但可用显存越少。\n- 内存安全余量GB：RAM 可用低于此值时触发“卸载全部模型 + 清理”。\n- 显存安全余量GB：VRAM 可用低于此值时触发“卸载部分模型占用 + 清理”。\n- 低内存时卸载全部模型：更激进，适合爆内存/频繁切图场景。\n- 运行时清空缓存：每次运行都做一次缓存清理，能缓解碎片但可能略慢。\n- 强制GC：强制 Python 垃圾回收，配合清理更彻底但可能卡一下。\n如何判断生效：看节点内显示的“动作=…”和“预留显存=…”，以及运行前后 RAM/VRAM 可用数值变化。"
+    DESCRIPTION = "用途：显存/内存智能优化（预留显存、低内存/低显存时卸载模型、清空缓存、GC）。\n放置位置：建议放在工作流最前面；或在加载大模型/高分辨率采样前再放一个。\n直通用法：把“🔌 任意输入”接在你想触发的位置，输出端继续接回原流程，即可精确控制本节点何时执行。\n信息展示：运行后信息会直接显示在节点里（无需接信息输出端口）。\n参数说明：\n- 预留显存GB：写入 ComfyUI 的预留显存设置，给系统/其它程序留显存；越大越稳，但可用显存越少。\n- 内存安全余量GB：RAM 可用低于此值时触发“卸载全部模型 + 清理”。\n- 显存安全余量GB：VRAM 可用低于此值时触发“卸载部分模型占用 + 清理”。\n- 低内存时卸载全部模型：更激进，适合爆内存/频繁切图场景。\n- 运行时清空缓存：每次运行都做一次缓存清理，能缓解碎片但可能略慢。\n- 强制GC：强制 Python 垃圾回收，配合清理更彻底但可能卡一下。\n- 后台采样：开启后在后台按间隔记录 RAM/交换区/进程RSS/Torch显存，节点内以折线显示，可看到节点之间的内存峰值。\n如何判断生效：看节点内显示的“动作=…”和“预留显存=…”，以及运行前后 RAM/VRAM 可用数值变化。"
 
     @classmethod
     def IS_CHANGED(cls, **kwargs):
@@ -26,6 +28,8 @@ class DapaoSmartMemoryOptimizerNode:
             },
             "optional": {
                 "🔌 任意输入": (IO.ANY, {"tooltip": "任意类型直通输入：把它接在你想触发优化的环节中间"}),
+                "📈 后台采样": ("BOOLEAN", {"default": False, "tooltip": "在后台持续记录内存/显存占用并在节点内绘制折线；关闭时停止采样"}),
+                "⏱️ 采样间隔秒": ("FLOAT", {"default": DEFAULT_INTERVAL, "min": MIN_INTERVAL, "max": 60.0, "step": 0.05, "tooltip": "后台采样的时间间隔(秒)，缓冲区固定长度，间隔越大覆盖的时间越长"}),
             },
             "hidden": {
                 "unique_id": "UNIQUE_ID",
@@ -58,8 +62,16 @@ class DapaoSmartMemoryOptimizerNode:
         unload_on_low_ram = bool(kwargs.get("🧹 低内存时卸载全部模型", True))
         clear_cache = bool(kwargs.get("🧽 运行时清空缓存", True))
         force_gc = bool(kwargs.get("🧯 强制GC", True))
+        telemetry = bool(kwargs.get("📈 后台采样", False))
+        telemetry_interval = float(kwargs.get("⏱️ 采样间隔秒", DEFAULT_INTERVAL))
 
         dev = model_management.get_torch_device()
+        sampler = get_memory_sampler()
+        if telemetry:
+            sampler.start(telemetry_interval, dev)
+        elif sampler.running:
+            sampler.stop()
+
         vm = psutil.virtual_memory()
         ram_total = int(vm.total)
         ram_avail = int(vm.available)
@@ -239,12 +251,58 @@ class DapaoSmartMemoryOptimizerNode:
             f"Torch占用={torch_usage_str} | "
             f"预留设置={self._format_bytes(int(model_management.EXTRA_RESERVED_VRAM))}"
         )
+        if sampler.running:
+            peaks = sampler.peaks()
+            if peaks:
+                info += (
+                    f"\n采样峰值: RAM占用={self._format_bytes(int(peaks['ram_used']))} | "
+                    f"交换区={self._format_bytes(int(peaks['swap_used']))} | "
+                    f"进程RSS={self._format_bytes(int(peaks['process_rss']))} | "
+                    f"Torch已分配={self._format_bytes(int(peaks['torch_allocated']))} | "
+                    f"Torch保留={self._format_bytes(int(peaks['torch_reserved']))}"
+                )
         if unique_id is not None:
             from server import PromptServer
             PromptServer.instance.send_sync("dapao.memopt.info", {"node_id": int(unique_id), "info": info})
         return {"ui": {"dapao_info": info, "text": [info]}, "result": (any_in,)}
 
 
+# API 路由：读取后台采样数据
+def setup_routes():
+    try:
+        from aiohttp import web
+        from server import PromptServer
+
+        routes = PromptServer.instance.routes
+        # 防止重复注册
+        for route in routes:
+            if route.method == "GET" and route.path == "/dapao/memopt/telemetry":
+                return
+
+        @routes.get("/dapao/memopt/telemetry")
+        async def get_memory_telemetry(request):
+            """返回 since 序号之后的采样记录（按字段分列），前端据此增量绘制折线"""
+            try:
+                since = int(request.query.get("since", 0))
+            except ValueError:
+                since = 0
+            sampler = get_memory_sampler()
+            seq, rows = sampler.snapshot(since)
+            return web.json_response({
+                "running": sampler.running,
+                "interval": sampler.interval,
+                "capacity": sampler.capacity,
+                "seq": seq,
+                "fields": list(TELEMETRY_FIELDS),
+                "samples": {name: rows[:, i].tolist() for i, name in enumerate(TELEMETRY_FIELDS)},
+            })
+
+    except Exception as e:
+        print(f"[Dapao] API Error: {e}")
+
+setup_routes()
+
+
 NODE_CLASS_MAPPINGS = {
     "DapaoSmartMemoryOptimizerNode": DapaoSmartMemoryOptimizerNode,
 }
@@ -1,6 +1,5 @@
 import torch
-import numpy as np
-from PIL import Image, ImageOps
+import torch.nn.functional as F
 
 class ImageAspectRatioResizeNode:
     """
@@ -42,7 +41,7 @@ class ImageAspectRatioResizeNode:
                 }),
                 "🔍 缩放算法": (["lanczos", "bicubic", "bilinear", "nearest"], {
                     "default": "lanczos",
-                    "tooltip": "图像缩放插值算法"
+                    "tooltip": "图像缩放插值算法。注意：lanczos 在张量上没有实现，实际使用抗锯齿 bicubic 近似（结果与旧版 PIL lanczos 略有差异）"
                 }),
                 "🔢 尺寸倍数": ("INT", {
                     "default": 8,
@@ -109,24 +108,21 @@ class ImageAspectRatioResizeNode:
         }
         scale_to_side_en = scale_to_side_map.get(scale_to_side, "None")
         
-        # 转换方法
+        # 转换方法（lanczos 没有张量实现，使用抗锯齿 bicubic 近似）
         method_map = {
-            "lanczos": Image.Resampling.LANCZOS,
-            "bicubic": Image.Resampling.BICUBIC,
-            "bilinear": Image.Resampling.BILINEAR,
-            "nearest": Image.Resampling.NEAREST
+            "lanczos": ("bicubic", True),
+            "bicubic": ("bicubic", True),
+            "bilinear": ("bilinear", True),
+            "nearest": ("nearest-exact", False)
         }
-        resample_method = method_map.get(method, Image.Resampling.LANCZOS)
-        
-        # 处理 batch
-        result_images = []
-        result_masks = []
+        interp_mode, antialias = method_map.get(method, ("bicubic", True))
         
         # 确保 image 是 list (batch)
         if len(image.shape) < 4:
             image = image.unsqueeze(0)
             
-        batch_size = image.shape[0]
+        batch_size, h, w = image.shape[0], image.shape[1], image.shape[2]
+        device = image.device
         
         # 处理 mask
         if mask is not None:
@@ -135,177 +131,163 @@ class ImageAspectRatioResizeNode:
             # 如果 mask batch 小于 image batch，需要广播
             if mask.shape[0] < batch_size:
                 mask = mask.repeat(batch_size, 1, 1)
+            mask = mask[:batch_size].to(device)
         
-        original_width = 0
-        original_height = 0
-        final_width = 0
-        final_height = 0
-
-        for i in range(batch_size):
-            # 1. 转换为 PIL
-            img_tensor = image[i]
-            img_pil = self.tensor2pil(img_tensor)
+        # 1. 整批共享同一尺寸，目标几何只计算一次
+        target_w, target_h = self.calculate_target_size(
+            w, h, aspect_ratio, proportional_width, proportional_height,
+            fit_mode_en, scale_to_side_en, scale_to_length, round_to_multiple
+        )
+        
+        # 2. 确定缩放尺寸与摆放位置
+        if fit_mode_en == "stretch":
+            # 拉伸模式：直接缩放到目标尺寸
+            scaled_w, scaled_h = target_w, target_h
+        elif fit_mode_en == "crop":
+            # 裁剪模式：保持比例缩放到覆盖目标尺寸（取较大比例），然后居中裁剪
+            scale = max(target_w / w, target_h / h)
+            scaled_w = max(int(w * scale), target_w)
+            scaled_h = max(int(h * scale), target_h)
+        else: # letterbox (默认)
+            # 适应模式：保持比例缩放到包含在目标尺寸内（取较小比例），居中，填充背景
+            scale = min(target_w / w, target_h / h)
+            scaled_w = int(w * scale)
+            scaled_h = int(h * scale)
+        
+        # 3. 图像与遮罩拼成一个 [B, C, H, W] 张量，一次 interpolate 完成整批缩放
+        x = image[..., :3].permute(0, 3, 1, 2)
+        mask_in_pass = mask is not None and mask.shape[1:] == (h, w)
+        if mask_in_pass:
+            x = torch.cat([x, mask.unsqueeze(1).to(x.dtype)], dim=1)
+        resized = self.resize_tensor(x, scaled_w, scaled_h, interp_mode, antialias)
+        
+        resized_mask = None
+        if mask_in_pass:
+            resized, resized_mask = resized[:, :3], resized[:, 3]
+        elif mask is not None:
+            # 遮罩尺寸与图像不同，单独缩放
+            resized_mask = self.resize_tensor(mask.unsqueeze(1), scaled_w, scaled_h, interp_mode, antialias)[:, 0]
+        
+        if fit_mode_en == "stretch":
+            final_images = resized
+            # 如果没有输入 mask，拉伸模式下默认全白 mask (表示全图有效)
+            final_masks = resized_mask if resized_mask is not None else \
+                torch.ones((batch_size, target_h, target_w), dtype=torch.float32, device=device)
+                
+        elif fit_mode_en == "crop":
+            # 计算居中裁剪位置
+            left = (scaled_w - target_w) // 2
+            top = (scaled_h - target_h) // 2
+            final_images = resized[:, :, top:top + target_h, left:left + target_w]
+            if resized_mask is not None:
+                final_masks = resized_mask[:, top:top + target_h, left:left + target_w]
+            else:
+                final_masks = torch.ones((batch_size, target_h, target_w), dtype=torch.float32, device=device)
+                
+        else:
+            # 计算居中位置
+            left = (target_w - scaled_w) // 2
+            top = (target_h - scaled_h) // 2
             
-            w, h = img_pil.size
-            original_width = w
-            original_height = h
+            # 背景画布：按通道填充背景色后放入缩放结果
+            bg_color = torch.tensor(self.hex_to_rgb(background_color), dtype=resized.dtype, device=device) / 255.0
+            final_images = bg_color.view(1, 3, 1, 1).repeat(batch_size, 1, target_h, target_w)
+            final_images[:, :, top:top + scaled_h, left:left + scaled_w] = resized
             
-            # 2. 计算目标宽高比
-            target_ratio = w / h
-            if aspect_ratio != "原图":
-                if aspect_ratio == "自定义":
-                    target_ratio = proportional_width / proportional_height
-                else:
-                    try:
-                        w_ratio, h_ratio = map(float, aspect_ratio.split(":"))
-                        target_ratio = w_ratio / h_ratio
-                    except:
-                        target_ratio = w / h
+            # 对应的 mask 画布 (黑色背景)，无输入 mask 时原图区域为白
+            final_masks = torch.zeros((batch_size, target_h, target_w), dtype=torch.float32, device=device)
+            final_masks[:, top:top + scaled_h, left:left + scaled_w] = resized_mask if resized_mask is not None else 1.0
+        
+        final_images_tensor = final_images.permute(0, 2, 3, 1).contiguous()
+        final_masks_tensor = final_masks.contiguous()
+        
+        # 返回 5 个值，对应 5 个 RETURN_TYPES
+        return (final_images_tensor, final_masks_tensor, w, target_w, target_h)
 
-            # 3. 计算目标尺寸
-            target_w = w
-            target_h = h
-            
-            if scale_to_side_en == "None":
-                # 不强制指定边长，根据 fit_mode 和宽高比计算
-                if fit_mode_en == "letterbox" or fit_mode_en == "stretch":
-                    # 包含原图：如果原图较宽，以宽为准；如果原图较高，以高为准
-                    # 但这里我们需要得到目标宽高比
-                    # Letterbox: 目标框包含原图。
-                    # 如果 w/h > target_ratio (原图更宽)，则宽不变，高增加 -> target_w = w, target_h = w / target_ratio
-                    # 如果 w/h < target_ratio (原图更高)，则高不变，宽增加 -> target_h = h, target_w = h * target_ratio
-                    if w / h > target_ratio:
-                        target_w = w
-                        target_h = int(w / target_ratio)
-                    else:
-                        target_h = h
-                        target_w = int(h * target_ratio)
-                elif fit_mode_en == "crop":
-                    # 裁剪原图：目标框在原图内
-                    # 如果 w/h > target_ratio (原图更宽)，则高不变，宽减小 -> target_h = h, target_w = h * target_ratio
-                    # 如果 w/h < target_ratio (原图更高)，则宽不变，高减小 -> target_w = w, target_h = w / target_ratio
-                    if w / h > target_ratio:
-                        target_h = h
-                        target_w = int(h * target_ratio)
-                    else:
-                        target_w = w
-                        target_h = int(w / target_ratio)
+    def calculate_target_size(self, w, h, aspect_ratio, proportional_width, proportional_height,
+                              fit_mode_en, scale_to_side_en, scale_to_length, round_to_multiple):
+        """根据宽高比、适应模式和锁定边长计算目标尺寸 (宽, 高)"""
+        # 计算目标宽高比
+        target_ratio = w / h
+        if aspect_ratio != "原图":
+            if aspect_ratio == "自定义":
+                target_ratio = proportional_width / proportional_height
             else:
-                # 指定了基准边和长度
-                length = scale_to_length
-                if scale_to_side_en == "Width":
-                    target_w = length
-                    target_h = int(length / target_ratio)
-                elif scale_to_side_en == "Height":
-                    target_h = length
-                    target_w = int(length * target_ratio)
-                elif scale_to_side_en == "Longest":
-                    if target_ratio >= 1: # 宽 >= 高
-                        target_w = length
-                        target_h = int(length / target_ratio)
-                    else:
-                        target_h = length
-                        target_w = int(length * target_ratio)
-                elif scale_to_side_en == "Shortest":
-                    if target_ratio >= 1: # 宽 >= 高，高是短边
-                        target_h = length
-                        target_w = int(length * target_ratio)
-                    else: # 宽是短边
-                        target_w = length
-                        target_h = int(length / target_ratio)
-            
-            # 4. 四舍五入对齐
-            if round_to_multiple > 1:
-                target_w = (target_w + round_to_multiple - 1) // round_to_multiple * round_to_multiple
-                target_h = (target_h + round_to_multiple - 1) // round_to_multiple * round_to_multiple
-            
-            final_width = target_w
-            final_height = target_h
-            
-            # 5. 执行缩放处理
-            
-            # 准备背景颜色
-            bg_color_rgb = self.hex_to_rgb(background_color)
-            
-            # 创建目标画布
-            new_img = Image.new("RGB", (target_w, target_h), bg_color_rgb)
-            
-            # 对应的 mask 画布 (黑色背景)
-            new_mask = Image.new("L", (target_w, target_h), 0)
-            
-            # 获取当前 mask (如果有)
-            current_mask = None
-            if mask is not None:
-                current_mask = self.tensor2pil_mask(mask[i])
-            
-            if fit_mode_en == "stretch":
-                # 拉伸模式：直接缩放到目标尺寸
-                resized_img = img_pil.resize((target_w, target_h), resample_method)
-                new_img.paste(resized_img, (0, 0))
-                
-                if current_mask:
-                    resized_mask = current_mask.resize((target_w, target_h), resample_method)
-                    new_mask.paste(resized_mask, (0, 0))
+                try:
+                    w_ratio, h_ratio = map(float, aspect_ratio.split(":"))
+                    target_ratio = w_ratio / h_ratio
+                except:
+                    target_ratio = w / h
+
+        # 计算目标尺寸
+        target_w = w
+        target_h = h
+        
+        if scale_to_side_en == "None":
+            # 不强制指定边长，根据 fit_mode 和宽高比计算
+            if fit_mode_en == "letterbox" or fit_mode_en == "stretch":
+                # Letterbox: 目标框包含原图。
+                # 如果 w/h > target_ratio (原图更宽)，则宽不变，高增加 -> target_w = w, target_h = w / target_ratio
+                # 如果 w/h < target_ratio (原图更高)，则高不变，宽增加 -> target_h = h, target_w = h * target_ratio
+                if w / h > target_ratio:
+                    target_w = w
+                    target_h = int(w / target_ratio)
                 else:
-                    # 如果没有输入 mask，拉伸模式下默认全白 mask (表示全图有效)
-                    new_mask = Image.new("L", (target_w, target_h), 255)
-                    
+                    target_h = h
+                    target_w = int(h * target_ratio)
             elif fit_mode_en == "crop":
-                # 裁剪模式：先保持比例缩放到覆盖目标尺寸，然后居中裁剪
-                # 计算缩放比例：取宽比和高比中较大的那个（保证覆盖）
-                scale = max(target_w / w, target_h / h)
-                scaled_w = int(w * scale)
-                scaled_h = int(h * scale)
-                
-                resized_img = img_pil.resize((scaled_w, scaled_h), resample_method)
-                
-                # 计算居中裁剪位置
-                left = (scaled_w - target_w) // 2
-                top = (scaled_h - target_h) // 2
-                
-                # Crop
-                cropped_img = resized_img.crop((left, top, left + target_w, top + target_h))
-                new_img.paste(cropped_img, (0, 0))
-                
-                if current_mask:
-                    resized_mask = current_mask.resize((scaled_w, scaled_h), resample_method)
-                    cropped_mask = resized_mask.crop((left, top, left + target_w, top + target_h))
-                    new_mask.paste(cropped_mask, (0, 0))
+                # 裁剪原图：目标框在原图内
+                # 如果 w/h > target_ratio (原图更宽)，则高不变，宽减小 -> target_h = h, target_w = h * target_ratio
+                # 如果 w/h < target_ratio (原图更高)，则宽不变，高减小 -> target_w = w, target_h = w / target_ratio
+                if w / h > target_ratio:
+                    target_h = h
+                    target_w = int(h * target_ratio)
                 else:
-                    new_mask = Image.new("L", (target_w, target_h), 255)
-
-            else: # letterbox (默认)
-                # 适应模式：保持比例缩放到包含在目标尺寸内，居中，填充背景
-                # 计算缩放比例：取宽比和高比中较小的那个（保证包含）
-                scale = min(target_w / w, target_h / h)
-                scaled_w = int(w * scale)
-                scaled_h = int(h * scale)
-                
-                resized_img = img_pil.resize((scaled_w, scaled_h), resample_method)
-                
-                # 计算居中位置
-                left = (target_w - scaled_w) // 2
-                top = (target_h - scaled_h) // 2
-                
-                new_img.paste(resized_img, (left, top))
-                
-                if current_mask:
-                    resized_mask = current_mask.resize((scaled_w, scaled_h), resample_method)
-                    new_mask.paste(resized_mask, (left, top))
+                    target_w = w
+                    target_h = int(w / target_ratio)
+        else:
+            # 指定了基准边和长度
+            length = scale_to_length
+            if scale_to_side_en == "Width":
+                target_w = length
+                target_h = int(length / target_ratio)
+            elif scale_to_side_en == "Height":
+                target_h = length
+                target_w = int(length * target_ratio)
+            elif scale_to_side_en == "Longest":
+                if target_ratio >= 1: # 宽 >= 高
+                    target_w = length
+                    target_h = int(length / target_ratio)
                 else:
-                    # 原图区域为白，背景为黑
-                    white_block = Image.new("L", (scaled_w, scaled_h), 255)
-                    new_mask.paste(white_block, (left, top))
-            
-            result_images.append(self.pil2tensor(new_img))
-            result_masks.append(self.pil2tensor_mask(new_mask))
-
-        # 合并 batch
-        final_images_tensor = torch.cat(result_images, dim=0)
-        final_masks_tensor = torch.cat(result_masks, dim=0)
+                    target_h = length
+                    target_w = int(length * target_ratio)
+            elif scale_to_side_en == "Shortest":
+                if target_ratio >= 1: # 宽 >= 高，高是短边
+                    target_h = length
+                    target_w = int(length * target_ratio)
+                else: # 宽是短边
+                    target_w = length
+                    target_h = int(length / target_ratio)
         
-        # 返回 5 个值，对应 5 个 RETURN_TYPES
-        return (final_images_tensor, final_masks_tensor, original_width, final_width, final_height)
+        # 四舍五入对齐
+        if round_to_multiple > 1:
+            target_w = (target_w + round_to_multiple - 1) // round_to_multiple * round_to_multiple
+            target_h = (target_h + round_to_multiple - 1) // round_to_multiple * round_to_multiple
+        
+        return target_w, target_h
+
+    def resize_tensor(self, x, width, height, mode, antialias):
+        """批量缩放 [B, C, H, W] 张量，尺寸不变时直接返回"""
+        if x.shape[2] == height and x.shape[3] == width:
+            return x
+        width = max(width, 1)
+        height = max(height, 1)
+        # NCHW 连续内存下 interpolate 走更快的内核
+        x = x.contiguous()
+        if mode == "nearest-exact":
+            return F.interpolate(x, size=(height, width), mode=mode)
+        x = F.interpolate(x, size=(height, width), mode=mode, align_corners=False, antialias=antialias)
+        return x.clamp_(0, 1)
 
     def hex_to_rgb(self, hex_color):
         """将十六进制颜色转换为RGB元组"""
@@ -314,15 +296,3 @@ class ImageAspectRatioResizeNode:
             return tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
         except:
             return (0, 0, 0)
-
-    def tensor2pil(self, image):
-        return Image.fromarray(np.clip(255. * image.cpu().numpy(), 0, 255).astype(np.uint8))
-
-    def pil2tensor(self, image):
-        return torch.from_numpy(np.array(image).astype(np.float32) / 255.0).unsqueeze(0)
-        
-    def tensor2pil_mask(self, mask):
-        return Image.fromarray(np.clip(255. * mask.cpu().numpy(), 0, 255).astype(np.uint8), mode='L')
-
-    def pil2tensor_mask(self, mask):
-        return torch.from_numpy(np.array(mask).astype(np.float32) / 255.0).unsqueeze(0)
@@ -1,6 +1,9 @@
 import torch
 import torch.nn.functional as F
 
+# 羽化半径不超过该值时直接做高斯卷积，更大时改用三次盒式模糊近似（耗时与半径无关）
+FEATHER_DIRECT_MAX = 16
+
 class DapaoImagePadDirectionNode:
     """
     按方向外补画板节点
@@ -76,6 +79,10 @@ class DapaoImagePadDirectionNode:
             },
             "optional": {
                 "😷 遮罩": ("MASK",),
+                "🪶 仅扩展遮罩": ("BOOLEAN", {
+                    "default": False,
+                    "tooltip": "未连接遮罩时，输出的遮罩为整批共享的一帧广播视图，不为每帧复制（下游需只读使用）"
+                }),
             }
         }
 
@@ -97,13 +104,11 @@ class DapaoImagePadDirectionNode:
         fill_color_hex = kwargs.get("🌈 填充色HEX", "#000000")
         feather = kwargs.get("🌫️ 羽化", 0)
         modulo = kwargs.get("🔢 整除数", 0)
+        expand_only = kwargs.get("🪶 仅扩展遮罩", False)
 
         # 处理 Mask 初始状态
-        if mask is None:
-            # 如果没有输入 mask，创建一个全黑 mask (表示保留原图)
-            # mask shape: [B, H, W]
-            mask = torch.zeros((image.shape[0], image.shape[1], image.shape[2]), dtype=torch.float32, device=image.device)
-        else:
+        # 未连接遮罩时不预先创建全黑 mask，输出时按几何直接生成
+        if mask is not None:
             # 确保 mask 维度匹配
             if len(mask.shape) == 2:
                 mask = mask.unsqueeze(0).repeat(image.shape[0], 1, 1)
@@ -135,6 +140,9 @@ class DapaoImagePadDirectionNode:
 
         # 检查是否需要外补
         if left == 0 and right == 0 and top == 0 and bottom == 0:
+            if mask is None:
+                # 全黑 mask (表示保留原图)
+                mask = self.batch_mask(torch.zeros((1, H, W), dtype=torch.float32, device=image.device), B, expand_only)
             return (image, mask, 0)
         
         # 解析颜色
@@ -163,27 +171,26 @@ class DapaoImagePadDirectionNode:
         else:
             rgb_color = color_map.get(fill_color_name, (0, 0, 0))
             
-        # 归一化颜色到 0-1
-        fill_r = rgb_color[0] / 255.0
-        fill_g = rgb_color[1] / 255.0
-        fill_b = rgb_color[2] / 255.0
+        # 归一化颜色到 0-1，Alpha 等额外通道填 0
+        fill = [c / 255.0 for c in rgb_color] + [0.0] * (C - 3)
 
-        # 执行图像 Padding (使用构建新画板的方法以支持颜色)
-        # image is [B, H, W, C]
-        target_h = H + top + bottom
-        target_w = W + left + right
-        
-        # 创建背景张量
-        new_image = torch.zeros((B, target_h, target_w, C), dtype=image.dtype, device=image.device)
-        
-        # 填充颜色
-        new_image[:, :, :, 0] = fill_r
-        new_image[:, :, :, 1] = fill_g
-        new_image[:, :, :, 2] = fill_b
-        
-        # 将原图复制到新画板
-        # top:top+H, left:left+W
-        new_image[:, top:top+H, left:left+W, :] = image
+        # 执行图像 Padding：一次写出整张画板
+        new_image = self.pad_constant(image, left, right, top, bottom, fill[:C])
+
+        # 未连接遮罩：原图区域为 0、外补区域为 1，按接缝剖面直接生成一帧
+        if mask is None:
+            result_mask = self.feather_seam_mask(
+                torch.zeros((1,), dtype=torch.float32, device=image.device),
+                H, W, left, right, top, bottom, feather
+            )
+            return (new_image, self.batch_mask(result_mask, B, expand_only), 1)
+
+        # 羽化且原图区域遮罩为常量时，只有接缝附近会变化，走接缝快速路径
+        if feather > 0:
+            mask_min = mask.amin(dim=(1, 2))
+            if torch.equal(mask_min, mask.amax(dim=(1, 2))):
+                result_mask = self.feather_seam_mask(mask_min, H, W, left, right, top, bottom, feather)
+                return (new_image, result_mask, 1)
 
         # 执行 Mask Padding
         # Mask: [B, H, W] -> Add Dim [B, 1, H, W]
@@ -194,15 +201,113 @@ class DapaoImagePadDirectionNode:
         
         # 羽化处理 (Feathering)
         if feather > 0:
-            # 使用高斯模糊处理 Mask
-            k_size = 2 * feather + 1
-            sigma = float(feather) / 2.0
-            mask_padded = self.gaussian_blur(mask_padded, k_size, sigma)
+            mask_padded = self.feather_mask(mask_padded, feather)
         
         result_mask = mask_padded.squeeze(1)
 
         return (new_image, result_mask, 1)
 
+    def pad_constant(self, x, left, right, top, bottom, fill):
+        """
+        按通道常量外补 [B, H, W, C] 图像，每个像素只写一次
+        - 各通道填充值相同时直接用一次 F.pad
+        - 否则分配一次画板，复制原图并只填充四条边带
+        """
+        B, H, W, C = x.shape
+        if all(v == fill[0] for v in fill):
+            return F.pad(x, (0, 0, left, right, top, bottom), mode='constant', value=fill[0])
+
+        out = torch.empty((B, H + top + bottom, W + left + right, C), dtype=x.dtype, device=x.device)
+        color = torch.tensor(fill, dtype=x.dtype, device=x.device)
+        out[:, :top] = color
+        out[:, top + H:] = color
+        out[:, top:top + H, :left] = color
+        out[:, top:top + H, left + W:] = color
+        out[:, top:top + H, left:left + W] = x
+        return out
+
+    def batch_mask(self, mask, batch_size, expand_only):
+        """
+        单帧 [1, H, W] 遮罩扩展到整批：仅扩展模式返回广播视图，否则复制为独立张量
+        """
+        mask = mask.expand(batch_size, -1, -1)
+        return mask if expand_only else mask.contiguous()
+
+    def feather_seam_mask(self, values, H, W, left, right, top, bottom, feather):
+        """
+        原图区域遮罩为常量时的羽化：外补后的遮罩为 1 - (1 - v) * 行指示 ⊗ 列指示，
+        模糊是可分离的，只需分别模糊一条行剖面和一条列剖面（只有接缝附近的值会变），
+        再对整批做一次外积，结果与整幅模糊一致
+        """
+        target_h = H + top + bottom
+        target_w = W + left + right
+        
+        rows = torch.zeros((1, 1, target_h, 1), dtype=torch.float32, device=values.device)
+        rows[:, :, top:top+H] = 1.0
+        cols = torch.zeros((1, 1, 1, target_w), dtype=torch.float32, device=values.device)
+        cols[:, :, :, left:left+W] = 1.0
+        
+        # 宽/高为 1 的剖面在另一方向上模糊是恒等变换；
+        # 一维剖面直接做精确高斯卷积（开销很小），外积后的角落不会叠加盒式近似的误差
+        if feather > 0:
+            rows = self.gaussian_blur(rows, 2 * feather + 1, float(feather) / 2.0)
+            cols = self.gaussian_blur(cols, 2 * feather + 1, float(feather) / 2.0)
+        rows = rows.view(1, target_h, 1)
+        cols = cols.view(1, 1, target_w)
+        
+        inside = (1.0 - values.to(torch.float32)).view(-1, 1, 1)
+        return 1.0 - inside * rows * cols
+
+    def feather_mask(self, x, feather):
+        """
+        按半径选择羽化方式：小半径直接高斯卷积，大半径用三次盒式模糊近似高斯
+
+        近似误差（与直接卷积相比的最大绝对差）：单条直边约 0.012；
+        多条边落在同一卷积窗口内（如角落、窄条）时误差叠加，最大约 0.03。
+        增加盒式模糊次数不能再降低误差（直接卷积的核在 ±2σ 处截断，并非完整高斯）
+        """
+        sigma = float(feather) / 2.0
+        if feather <= FEATHER_DIRECT_MAX:
+            return self.gaussian_blur(x, 2 * feather + 1, sigma)
+        # 直接卷积的核在 ±2σ 处截断，其方差约为 0.774σ²，盒式模糊按该方差匹配
+        box_sizes = self.gaussian_box_sizes(sigma * 0.88, 3)
+        # 按三次盒式模糊的总半径只做一次 replicate 填充，各次模糊不再单独填充，
+        # 边缘行为与单个宽卷积核（直接卷积）一致
+        support = sum(box_size // 2 for box_size in box_sizes)
+        x = F.pad(x, (support, support, 0, 0), mode='replicate')
+        for box_size in box_sizes:
+            x = self.box_blur(x, box_size, dim=3)
+        x = F.pad(x, (0, 0, support, support), mode='replicate')
+        for box_size in box_sizes:
+            x = self.box_blur(x, box_size, dim=2)
+        return x
+
+    def gaussian_box_sizes(self, sigma, n):
+        """
+        计算 n 次盒式模糊的窗口宽度，使其叠加后的方差等于 sigma^2
+        """
+        w_ideal = (12 * sigma * sigma / n + 1) ** 0.5
+        w_low = int(w_ideal)
+        if w_low % 2 == 0:
+            w_low -= 1
+        w_up = w_low + 2
+        m_ideal = (12 * sigma * sigma - n * w_low * w_low - 4 * n * w_low - 3 * n) / (-4 * w_low - 4)
+        m = round(m_ideal)
+        return [w_low if i < m else w_up for i in range(n)]
+
+    def box_blur(self, x, box_size, dim):
+        """
+        基于前缀和（积分图）的一维盒式模糊，耗时与窗口大小无关；
+        不做填充（valid），输出在 dim 上比输入短 box_size - 1
+        """
+        n = x.shape[dim] - box_size + 1
+        shape = list(x.shape)
+        shape[dim] = 1
+        csum = torch.cat([x.new_zeros(shape), torch.cumsum(x, dim=dim)], dim=dim)
+        upper = csum.narrow(dim, box_size, n)
+        lower = csum.narrow(dim, 0, n)
+        return (upper - lower) / box_size
+
     def gaussian_blur(self, x, k_size, sigma):
         """
         使用 PyTorch 实现简单的二维高斯模糊
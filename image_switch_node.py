@@ -11,7 +11,14 @@ class ImageMultiSwitchNode:
     - 使用编号选择器快速切换图片
     - 支持自动检测有效图片并跳过空图片
     - 美化的参数显示界面
+    - 图片输入为惰性(lazy)输入，只计算被选中的那一路分支
     """
+
+    def __init__(self):
+        # 本次执行中已请求计算过的输入（用于跳过空图片时判断候选是否已计算）
+        self.requested_inputs = set()
+        # 上述记录所属的 prompt；节点实例会跨 prompt 复用，换了 prompt 记录即作废
+        self.requested_prompt = None
     
     @classmethod
     def IS_CHANGED(cls, **kwargs):
@@ -49,13 +56,17 @@ class ImageMultiSwitchNode:
             }
         }
         
-        # 只添加默认数量的图片输入端口
-        # 使用 image1, image2... 命名（从1开始）
-        for i in range(1, DEFAULT_IMAGES + 1):
+        # 声明全部图片输入端口并设为惰性输入，未被选中的分支不会执行
+        # 使用 image1, image2... 命名（从1开始），前端初始只显示默认数量
+        for i in range(1, MAX_IMAGES + 1):
             inputs["optional"][f"image{i}"] = ("IMAGE", {
+                "lazy": True,
                 "tooltip": f"第{i}张输入图片（可选）"
             })
         
+        # 每次执行的 prompt 对象，用来区分惰性请求记录属于哪一次执行
+        inputs["hidden"] = {"prompt": "PROMPT"}
+        
         return inputs
     
     RETURN_TYPES = ("IMAGE", "STRING", "INT", "INT")
@@ -63,6 +74,62 @@ class ImageMultiSwitchNode:
     FUNCTION = "switch_image"
     CATEGORY = "🤖Dapao-Toolbox"
     
+    def check_lazy_status(self, **kwargs):
+        """
+        惰性输入检查：只请求当前需要的那一张图片
+        
+        - 已连接但尚未计算的输入以 None 出现在 kwargs 中，未连接的输入不会出现
+        - 按候选顺序依次检查，遇到已计算的有效图片即停止
+        - 候选已计算过但结果为空时，才继续请求下一个候选（跳过空图片）
+        - 请求记录按 prompt 区分：上一次执行中途出错或被中断时遗留的记录不会带到本次
+        """
+        select_index = kwargs.get("🎯 编号", 1)
+        skip_empty = kwargs.get("⏭️ 跳过空图片", True)
+        loop_mode = kwargs.get("🔄 循环模式", False)
+        
+        prompt = kwargs.get("prompt")
+        if prompt is not self.requested_prompt:
+            self.requested_prompt = prompt
+            self.requested_inputs = set()
+        
+        for idx in self.candidate_order(kwargs, select_index, skip_empty, loop_mode):
+            name = f"image{idx}"
+            if kwargs[name] is not None:
+                return []
+            if name not in self.requested_inputs:
+                self.requested_inputs.add(name)
+                return [name]
+        return []
+
+    def candidate_order(self, kwargs, select_index, skip_empty, loop_mode):
+        """
+        计算候选图片编号顺序：首选编号在前，启用跳过空图片时依次追加后续已连接的编号
+        """
+        connected = sorted(
+            int(key[5:]) for key in kwargs
+            if key.startswith("image") and key[5:].isdigit()
+        )
+        if not connected:
+            return []
+        
+        # 直接使用编号查找对应的图片
+        if select_index in connected:
+            first = connected.index(select_index)
+        elif loop_mode:
+            # 循环模式：将编号映射到已连接的图片列表
+            first = (select_index - 1) % len(connected)
+        elif select_index < connected[0]:
+            # 小于最小编号，使用第一张
+            first = 0
+        else:
+            # 大于最大编号，使用最后一张
+            first = len(connected) - 1
+        
+        if not skip_empty:
+            return [connected[first]]
+        # 从首选开始依次向后，末尾绕回开头
+        return connected[first:] + connected[:first]
+
     def switch_image(self, **kwargs):
         """
         多图片切换的主要逻辑函数
@@ -82,47 +149,27 @@ class ImageMultiSwitchNode:
         skip_empty = kwargs.get("⏭️ 跳过空图片", True)
         loop_mode = kwargs.get("🔄 循环模式", False)
         
-        # 收集所有输入的图片（检查所有可能的输入端口）
-        images = []
-        for i in range(1, MAX_IMAGES + 1):
-            img = kwargs.get(f"image{i}", None)
-            if img is not None:
-                images.append((i, img))  # 保存编号和图片
+        # 本次执行结束，清空惰性请求记录
+        self.requested_inputs = set()
+        self.requested_prompt = None
+        
+        # 已连接的图片输入（未被请求的惰性输入值为 None）
+        candidates = self.candidate_order(kwargs, select_index, skip_empty, loop_mode)
         
         # 如果没有任何图片输入，返回错误信息
-        if not images:
+        if not candidates:
             error_msg = "❌ 错误: 没有输入任何图片！"
             return (None, error_msg, 0, 0)
         
-        total_images = len(images)
+        total_images = sum(1 for key in kwargs if key.startswith("image") and key[5:].isdigit())
         
-        # 直接使用编号查找对应的图片
-        selected_image = kwargs.get(f"image{select_index}", None)
-        selected_idx = select_index
-        
-        # 如果选中的图片不存在，需要处理
-        if selected_image is None:
-            if loop_mode and total_images > 0:
-                # 循环模式：使用取模找到有效的图片
-                # 将编号映射到实际存在的图片列表
-                index = ((select_index - 1) % total_images)
-                selected_idx, selected_image = images[index]
-            else:
-                # 非循环模式：使用边界限制
-                if select_index < images[0][0]:
-                    # 小于最小编号，使用第一张
-                    selected_idx, selected_image = images[0]
-                else:
-                    # 大于最大编号，使用最后一张
-                    selected_idx, selected_image = images[-1]
-        
-        # 如果启用了跳过空图片功能
-        if selected_image is None and skip_empty and total_images > 0:
-            # 找到第一张有效的图片
-            for idx, img in images:
-                if img is not None:
-                    selected_idx, selected_image = idx, img
-                    break
+        # 按候选顺序取第一张有效图片
+        selected_idx, selected_image = candidates[0], None
+        for idx in candidates:
+            img = kwargs.get(f"image{idx}")
+            if img is not None:
+                selected_idx, selected_image = idx, img
+                break
         
         # 生成信息文本
         info_lines = [
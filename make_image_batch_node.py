@@ -1,9 +1,12 @@
+import re
 import torch
 import torch.nn.functional as F
 
 # 定义默认和最大输入数量
 DEFAULT_IMAGES = 2  # 默认显示2个输入（前端会自动扩展）
-MAX_IMAGES = 20     # 最多支持20个输入
+MAX_IMAGES = 256    # 前端最多扩展到256个输入（后端不限制数量）
+
+IMAGE_INPUT_PATTERN = re.compile(r"^📸 图像(\d+)$")
 
 
 class MakeImageBatchNode:
@@ -13,15 +16,21 @@ class MakeImageBatchNode:
     功能说明：
     - 接收多个单独的图像输入
     - 将它们合并成一个图像批次（batch）
-    - 支持最多20个图像输入
+    - 支持最多256个图像输入
     - 智能动态输入：默认2个，连接后自动增加
+    - 尺寸不一致时支持拉伸、包含(保持比例加黑边)、裁剪(保持比例居中裁剪)
     """
     
     @classmethod
     def INPUT_TYPES(cls):
         """定义节点的输入端口"""
         inputs = {
-            "required": {},
+            "required": {
+                "🎨 适应模式": (["拉伸", "包含", "裁剪"], {
+                    "default": "拉伸",
+                    "tooltip": "尺寸与第一张图不一致时的处理方式：拉伸=强制缩放，包含=保持比例并填充黑边，裁剪=保持比例并居中裁剪"
+                }),
+            },
             "optional": {}
         }
         
@@ -48,43 +57,89 @@ class MakeImageBatchNode:
         - 返回合并后的批次和图像数量
         """
         
-        # 收集所有输入的图像（检查所有可能的输入端口）
-        images = []
-        for i in range(1, MAX_IMAGES + 1):
-            img = kwargs.get(f"📸 图像{i}", None)
-            if img is not None:
-                images.append(img)
+        fit_mode = kwargs.get("🎨 适应模式", "拉伸")
+        
+        # 收集所有输入的图像，按端口编号排序（前端删除空端口后编号可能不连续）
+        indexed = []
+        for key, img in kwargs.items():
+            match = IMAGE_INPUT_PATTERN.match(key)
+            if match and img is not None:
+                indexed.append((int(match.group(1)), img))
+        images = [img for _, img in sorted(indexed, key=lambda item: item[0])]
         
         # 如果没有任何图像，返回错误
         if len(images) == 0:
             raise ValueError("❌ 错误: 至少需要提供一张图像！")
             
         # 统一图像尺寸（以第一张图像为准）
-        target_h = images[0].shape[1]
-        target_w = images[0].shape[2]
-        processed_images = []
+        first = images[0]
+        target_h = first.shape[1]
+        target_w = first.shape[2]
         
+        # 预分配输出批次，每张图只写入一次
+        offsets = []
+        total = 0
         for img in images:
-            # 如果尺寸不一致，进行缩放
-            if img.shape[1] != target_h or img.shape[2] != target_w:
-                # 调整维度顺序为 [batch, channels, height, width] 以便 interpolate 使用
-                img = img.permute(0, 3, 1, 2)
-                # 缩放
-                img = F.interpolate(img, size=(target_h, target_w), mode='bilinear', align_corners=False)
-                # 恢复维度顺序为 [batch, height, width, channels]
-                img = img.permute(0, 2, 3, 1)
-            processed_images.append(img)
+            offsets.append(total)
+            total += img.shape[0]
+        batch_images = torch.empty((total, target_h, target_w, first.shape[3]), dtype=first.dtype, device=first.device)
+        
+        # 按源尺寸分组：同尺寸的输入合并后只调用一次 interpolate
+        groups = {}
+        for idx, img in enumerate(images):
+            groups.setdefault((img.shape[1], img.shape[2]), []).append(idx)
         
-        # 合并所有图像成一个批次
-        # 每个图像的shape是 [batch, height, width, channels]
-        # 我们需要将它们沿着batch维度连接
-        batch_images = torch.cat(processed_images, dim=0)
+        for (src_h, src_w), members in groups.items():
+            if src_h == target_h and src_w == target_w:
+                for idx in members:
+                    batch_images[offsets[idx]:offsets[idx] + images[idx].shape[0]] = images[idx]
+                continue
+            
+            # 调整维度顺序为 [batch, channels, height, width] 以便 interpolate 使用
+            group = torch.cat([images[idx] for idx in members], dim=0) if len(members) > 1 else images[members[0]]
+            resized = self.fit_to_target(group.permute(0, 3, 1, 2).to(first.device), target_h, target_w, fit_mode)
+            # 恢复维度顺序为 [batch, height, width, channels] 并写回各自位置
+            resized = resized.permute(0, 2, 3, 1)
+            
+            start = 0
+            for idx in members:
+                count = images[idx].shape[0]
+                batch_images[offsets[idx]:offsets[idx] + count] = resized[start:start + count]
+                start += count
         
         # 返回批次和图像数量
         image_count = batch_images.shape[0]
         
         return (batch_images, image_count)
 
+    def fit_to_target(self, img, target_h, target_w, fit_mode):
+        """
+        将 [B, C, H, W] 图像按适应模式缩放到目标尺寸，同组图像共用一次计算的几何参数
+        """
+        src_h, src_w = img.shape[2], img.shape[3]
+        
+        if fit_mode == "拉伸":
+            return F.interpolate(img, size=(target_h, target_w), mode='bilinear', align_corners=False)
+        
+        if fit_mode == "裁剪":
+            # 保持比例缩放到覆盖目标尺寸，再居中裁剪
+            scale = max(target_h / src_h, target_w / src_w)
+            scaled_h = max(int(src_h * scale), target_h)
+            scaled_w = max(int(src_w * scale), target_w)
+            img = F.interpolate(img, size=(scaled_h, scaled_w), mode='bilinear', align_corners=False)
+            top = (scaled_h - target_h) // 2
+            left = (scaled_w - target_w) // 2
+            return img[:, :, top:top + target_h, left:left + target_w]
+        
+        # 包含：保持比例缩放到目标尺寸以内，居中后黑边填充
+        scale = min(target_h / src_h, target_w / src_w)
+        scaled_h = max(min(int(src_h * scale), target_h), 1)
+        scaled_w = max(min(int(src_w * scale), target_w), 1)
+        img = F.interpolate(img, size=(scaled_h, scaled_w), mode='bilinear', align_corners=False)
+        top = (target_h - scaled_h) // 2
+        left = (target_w - scaled_w) // 2
+        return F.pad(img, (left, target_w - scaled_w - left, top, target_h - scaled_h - top), mode='constant', value=0.0)
+
 
 # ========== 节点注册配置 ==========
 NODE_CLASS_MAPPINGS = {
@@ -1,10 +1,14 @@
-import time
+import threading
 from server import PromptServer
 from aiohttp import web
 import uuid
 
-# 全局缓存
+# 全局缓存（aiohttp 事件循环与执行线程同时访问，读写都需持有 BRAKE_LOCK）
 BRAKE_CACHE = {}
+BRAKE_LOCK = threading.Lock()
+
+# 批量审阅时，前端面板中各条提示词之间的分隔行
+BATCH_SEPARATOR = "\n----------\n"
 
 class PromptBrakeNode:
     """
@@ -18,6 +22,9 @@ class PromptBrakeNode:
                 "text": ("STRING", {"forceInput": True, "multiline": True, "label": "📝 提示词(Input)"}), 
                 "⏱️ 超时时间(秒)": ("INT", {"default": 60, "min": 5, "max": 3600, "step": 1, "display": "number"}),
             },
+            "optional": {
+                "📋 批量审阅": ("BOOLEAN", {"default": False, "label_on": "整批一次确认", "label_off": "逐条确认"}),
+            },
             "hidden": {
                 "unique_id": "UNIQUE_ID",
                 "prompt": "PROMPT",
@@ -29,56 +36,83 @@ class PromptBrakeNode:
     RETURN_NAMES = ("📝 最终提示词",)
     FUNCTION = "run_brake"
     CATEGORY = "🤖Dapao-Toolbox" # 修正分类到带机器人Emoji的组
+    
+    # 启用列表输入模式：上游输出提示词列表时整批进入一次调用，而不是每条各执行一次
+    INPUT_IS_LIST = True
+    OUTPUT_IS_LIST = (True,)
 
     def run_brake(self, text, unique_id=None, prompt=None, extra_pnginfo=None, **kwargs):
-        # 获取中文参数
-        timeout = kwargs.get("⏱️ 超时时间(秒)", 60)
+        # 由于 INPUT_IS_LIST = True，所有参数都会变成 list，普通参数取第一个值
+        texts = list(text) if isinstance(text, list) else [text]
+        timeout = first_value(kwargs.get("⏱️ 超时时间(秒)"), 60)
+        batch_review = first_value(kwargs.get("📋 批量审阅"), False)
+        my_id = first_value(unique_id, None)
+        
+        if batch_review:
+            # 整批审阅：一次弹出、一次确认
+            return (self.wait_for_review(my_id, texts, timeout, batch=True),)
         
-        my_id = unique_id
+        # 逐条审阅：与单条输入时的行为一致
+        results = []
+        for item in texts:
+            results.extend(self.wait_for_review(my_id, [item], timeout, batch=False))
+        return (results,)
+
+    def wait_for_review(self, my_id, texts, timeout, batch):
+        """
+        发送提示词给前端并阻塞等待确认，返回（可能被修改过的）提示词列表
+        """
         print(f"[PromptBrake] Node {my_id} started.")
         
-        # 1. 注册状态
-        BRAKE_CACHE[my_id] = {
-            "status": "waiting",
-            "text": text,
-        }
+        # 1. 注册状态，每个等待中的刹车持有自己的 Event，由路由触发唤醒
+        event = threading.Event()
+        with BRAKE_LOCK:
+            BRAKE_CACHE[my_id] = {
+                "status": "waiting",
+                "texts": texts,
+                "event": event,
+            }
         
         # 2. 发送事件给前端 (前端据此弹窗或更新UI)
-        PromptServer.instance.send_sync("dapao.brake.start", {
+        message = {
             "node_id": my_id,
-            "text": text,
+            "text": texts[0] if len(texts) == 1 else BATCH_SEPARATOR.join(texts),
             "timeout": timeout
-        })
+        }
+        if batch:
+            message["texts"] = texts
+        PromptServer.instance.send_sync("dapao.brake.start", message)
         
-        # 3. 阻塞循环
-        start_time = time.time()
-        final_text = text
+        # 3. 阻塞等待：确认后立即唤醒，超时则保持原文本
+        final_texts = texts
         
         try:
-            while True:
-                elapsed = time.time() - start_time
-                if elapsed > timeout:
-                    print(f"[PromptBrake] Timeout.")
-                    break
-                
-                state = BRAKE_CACHE.get(my_id)
-                if state and state["status"] == "done":
-                    # 从缓存获取最新的文本（可能是用户修改过的）
-                    final_text = state["text"] 
-                    print(f"[PromptBrake] Confirmed.")
-                    break
-                
-                time.sleep(0.1)
+            if event.wait(timeout):
+                with BRAKE_LOCK:
+                    state = BRAKE_CACHE.get(my_id)
+                    if state and state["status"] == "done":
+                        # 从缓存获取最新的文本（可能是用户修改过的）
+                        final_texts = state["texts"]
+                print(f"[PromptBrake] Confirmed.")
+            else:
+                print(f"[PromptBrake] Timeout.")
                 
         finally:
-            if my_id in BRAKE_CACHE:
-                del BRAKE_CACHE[my_id]
+            with BRAKE_LOCK:
+                BRAKE_CACHE.pop(my_id, None)
             
             PromptServer.instance.send_sync("dapao.brake.end", {
                 "node_id": my_id
             })
 
-        return (final_text,)
+        return final_texts
+
+
+def first_value(value, default):
+    """列表输入模式下取第一个值"""
+    if isinstance(value, list):
+        return value[0] if value else default
+    return default if value is None else value
 
 # API 路由
 def setup_routes():
@@ -95,14 +129,31 @@ def setup_routes():
                 data = await request.json()
                 node_id = data.get("node_id")
                 new_text = data.get("text")
+                new_texts = data.get("texts")
                 action = data.get("action")
                 
-                if node_id in BRAKE_CACHE:
-                    BRAKE_CACHE[node_id]["text"] = new_text
-                    BRAKE_CACHE[node_id]["status"] = "done"
-                    return web.json_response({"status": "success"})
-                else:
-                    return web.json_response({"status": "error"}, status=404)
+                # 批量审阅提交整个列表，逐条审阅只提交一条
+                if not isinstance(new_texts, list):
+                    new_texts = [new_text]
+                
+                with BRAKE_LOCK:
+                    state = BRAKE_CACHE.get(node_id)
+                    if state is None:
+                        return web.json_response({"status": "error"}, status=404)
+                    # 条数必须与待审阅的列表一致：分隔行被删或提示词里含分隔行时，
+                    # 下游 OUTPUT_IS_LIST 节点看到的条数会悄悄改变，这里直接拒绝，等待用户修正后重新提交
+                    expected = len(state["texts"])
+                    if len(new_texts) != expected:
+                        return web.json_response({
+                            "status": "error",
+                            "error": f"提示词条数不一致：应为 {expected} 条，收到 {len(new_texts)} 条",
+                            "expected": expected,
+                        }, status=400)
+                    state["texts"] = [str(item) for item in new_texts]
+                    state["status"] = "done"
+                    state["event"].set()
+                
+                return web.json_response({"status": "success"})
             except Exception as e:
                 return web.json_response({"status": "error"}, status=500)
                 
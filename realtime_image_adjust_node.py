@@ -1,17 +1,33 @@
 import torch
-import numpy as np
 from PIL import Image, ImageEnhance
 import torch.nn.functional as F
-import base64
-import io
 from server import PromptServer
 from threading import Event
 from aiohttp import web
 import traceback
+import os
+import time
+import folder_paths
+import comfy.model_management as model_management
 
 # 全局存储节点数据
 node_data = {}
 
+# 饱和度计算使用的亮度权重（与前端预览一致）
+LUMA_WEIGHTS = (0.299, 0.587, 0.114)
+
+# 等待期间检查中断标志与超时的间隔（秒）
+WAIT_POLL_INTERVAL = 0.25
+
+# 会话超过超时时间仍留在 node_data 中即视为过期（秒，timeout=0 的会话使用此上限）
+STALE_SESSION_SECONDS = 24 * 3600
+
+# 代理预览图格式：(文件扩展名, PIL 保存参数)
+PREVIEW_FORMATS = {
+    "JPEG": ("jpg", {"format": "JPEG", "quality": 90}),
+    "WEBP": ("webp", {"format": "WEBP", "quality": 90, "method": 0}),
+}
+
 
 class DapaoRealtimeImageAdjustNode:
     """
@@ -39,6 +55,26 @@ class DapaoRealtimeImageAdjustNode:
                     "tooltip": "输入图像"
                 }),
             },
+            "optional": {
+                "preview_max_side": ("INT", {
+                    "default": 1024,
+                    "min": 256,
+                    "max": 8192,
+                    "step": 64,
+                    "tooltip": "代理预览图的最长边，原图只在应用调整时全尺寸计算"
+                }),
+                "preview_format": (list(PREVIEW_FORMATS.keys()), {
+                    "default": "JPEG",
+                    "tooltip": "代理预览图编码格式"
+                }),
+                "timeout_seconds": ("INT", {
+                    "default": 600,
+                    "min": 0,
+                    "max": 86400,
+                    "step": 10,
+                    "tooltip": "等待应用调整的最长时间，超时后原图直接输出（0=不限时）"
+                }),
+            },
             "hidden": {
                 "unique_id": "UNIQUE_ID",
             }
@@ -50,7 +86,7 @@ class DapaoRealtimeImageAdjustNode:
     CATEGORY = "🤖Dapao-Toolbox"
     OUTPUT_NODE = True  # 标记为输出节点，支持实时预览
     
-    def adjust_image(self, image, unique_id):
+    def adjust_image(self, image, unique_id, preview_max_side=1024, preview_format="JPEG", timeout_seconds=600):
         """
         调整图像 - 等待前端实时调整完成
         """
@@ -58,44 +94,54 @@ class DapaoRealtimeImageAdjustNode:
             node_id = str(unique_id)  # 确保是字符串
             event = Event()
             
+            # 清理残留的过期会话，释放其持有的图像
+            expire_stale_sessions()
+            
             # 存储节点数据和事件
             node_data[node_id] = {
                 "event": event,
-                "result": None,
-                "shape": image.shape
+                "shape": image.shape,
+                "created": time.time(),
+                "timeout": timeout_seconds
             }
             
             print(f"[实时图像调整] 节点ID: {node_id}, 类型: {type(node_id)}")
             
-            # 准备预览图像（转换为base64）
-            preview_image = (torch.clamp(image.clone(), 0, 1) * 255).cpu().numpy().astype(np.uint8)[0]
-            pil_image = Image.fromarray(preview_image)
-            buffer = io.BytesIO()
-            pil_image.save(buffer, format="PNG")
-            base64_image = base64.b64encode(buffer.getvalue()).decode('utf-8')
-            
             try:
-                # 通过WebSocket发送预览图像到前端
+                # 生成缩小的代理预览图，写入临时目录后只通过WebSocket发送URL
+                preview_url = self.save_proxy_preview(image, node_id, preview_max_side, preview_format)
                 PromptServer.instance.send_sync("realtime_image_adjust_update", {
                     "node_id": node_id,
-                    "image_data": f"data:image/png;base64,{base64_image}",
+                    "image_url": preview_url,
                     "shape": list(image.shape)
                 })
                 
                 print(f"[实时图像调整] 节点 {node_id} 发送预览图像，等待用户点击'应用调整'按钮...")
                 
-                # 无限等待，直到用户点击"应用调整"按钮
-                event.wait()
+                # 等待用户点击"应用调整"按钮，期间响应中断，超时后原图直接输出
+                if not self.wait_for_apply(event, timeout_seconds):
+                    print(f"[实时图像调整] 节点 {node_id} 等待超时({timeout_seconds}秒)，原图直接输出")
+                    node_data.pop(node_id, None)
+                    return (image,)
                 
                 print(f"[实时图像调整] 节点 {node_id} 用户已应用调整，继续执行")
                 
-                # 获取调整后的结果
-                result_image = node_data[node_id]["result"]
-                del node_data[node_id]
+                # 获取调整后的结果：前端只发送参数时，在服务端对整批图像全精度计算
+                node_info = node_data.pop(node_id, None)
+                if node_info is None:
+                    # 会话已被取消
+                    return (image,)
+                if node_info.get("params") is None:
+                    return (image,)
+                result_image = self.apply_adjustments(image, node_info["params"])
                 
                 print(f"[实时图像调整] 节点 {node_id} 接收到调整结果")
-                return (result_image if result_image is not None else image,)
+                return (result_image,)
                 
+            except model_management.InterruptProcessingException:
+                # 用户中断执行：释放会话后向上抛出，交给 ComfyUI 处理
+                node_data.pop(node_id, None)
+                raise
             except Exception as e:
                 print(f"[实时图像调整] 节点 {node_id} 处理失败: {str(e)}")
                 traceback.print_exc()
@@ -103,6 +149,8 @@ class DapaoRealtimeImageAdjustNode:
                     del node_data[node_id]
                 return (image,)
             
+        except model_management.InterruptProcessingException:
+            raise
         except Exception as e:
             print(f"[实时图像调整] 执行失败: {str(e)}")
             traceback.print_exc()
@@ -111,16 +159,131 @@ class DapaoRealtimeImageAdjustNode:
             return (image,)
 
 
+    def wait_for_apply(self, event, timeout_seconds):
+        """
+        分段等待应用事件，每段之间检查 ComfyUI 中断标志
+
+        返回 True 表示已应用（或会话被取消），False 表示超时
+        """
+        deadline = time.monotonic() + timeout_seconds if timeout_seconds > 0 else None
+        while not event.wait(WAIT_POLL_INTERVAL):
+            model_management.throw_exception_if_processing_interrupted()
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+        return True
+    
+    def save_proxy_preview(self, image, node_id, max_side, preview_format):
+        """
+        生成代理预览图：在设备上把第一帧缩小到最长边不超过 max_side，
+        编码为 JPEG/WebP 写入临时目录，返回 /view 访问地址
+        """
+        height, width = image.shape[1], image.shape[2]
+        scale = max_side / max(height, width)
+        # 先按整数步长抽样到不超过目标的 2 倍，抗锯齿缩放的开销只与预览尺寸相关
+        step = max(1, int(1.0 / (scale * 2)))
+        frame = image[:1, ::step, ::step, :3].permute(0, 3, 1, 2).float()
+        if scale < 1.0:
+            size = (max(1, round(height * scale)), max(1, round(width * scale)))
+            frame = F.interpolate(frame, size=size, mode="bilinear",
+                                  align_corners=False, antialias=True)
+        preview = (torch.clamp(frame[0], 0, 1) * 255).round().to(torch.uint8)
+        preview = preview.permute(1, 2, 0).cpu().numpy()
+        
+        extension, save_kwargs = PREVIEW_FORMATS.get(preview_format, PREVIEW_FORMATS["JPEG"])
+        # 每个节点固定一个文件名，重复执行时直接覆盖，不在临时目录里堆积
+        filename = f"dapao_realtime_adjust_{node_id}.{extension}"
+        Image.fromarray(preview).save(os.path.join(folder_paths.get_temp_directory(), filename), **save_kwargs)
+        return f"/view?filename={filename}&type=temp&subfolder=&rand={time.time_ns()}"
+    
+    def apply_adjustments(self, image, params):
+        """
+        服务端参数化调整引擎：对整批图像执行与前端预览相同的调整
+        
+        顺序：亮度 -> 对比度（以 128 为中心，与预览一致）-> 亮度加权饱和度 -> 裁剪到目标比例 -> 抗锯齿缩放
+        """
+        # 与前端一致：参数为 0 或缺失时视为 1.0
+        brightness = float(params.get("brightness") or 1.0)
+        contrast = float(params.get("contrast") or 1.0)
+        saturation = float(params.get("saturation") or 1.0)
+        
+        x = image[..., :3].float()
+        x = torch.clamp(x * brightness, max=1.0)
+        x = x * contrast + (128.0 / 255.0) * (1.0 - contrast)
+        if saturation != 1.0:
+            weights = torch.tensor(LUMA_WEIGHTS, dtype=x.dtype, device=x.device)
+            luma = (x * weights).sum(dim=-1, keepdim=True)
+            x = luma + (x - luma) * saturation
+        x = torch.clamp(x, 0.0, 1.0)
+        
+        _, orig_h, orig_w, _ = x.shape
+        target_w, target_h = self.calculate_target_size(
+            orig_w, orig_h,
+            int(params.get("target_width") or 0),
+            int(params.get("target_height") or 0),
+            bool(params.get("keep_aspect", True))
+        )
+        if (target_w, target_h) == (orig_w, orig_h):
+            return x
+        
+        # 比例不一致时先按裁剪位置裁剪到目标比例
+        orig_aspect = orig_w / orig_h
+        target_aspect = target_w / target_h
+        if abs(orig_aspect - target_aspect) > 0.01:
+            if target_aspect > orig_aspect:
+                crop_w, crop_h = orig_w, round(orig_w / target_aspect)
+            else:
+                crop_w, crop_h = round(orig_h * target_aspect), orig_h
+            crop_x, crop_y = self.calculate_crop_position(
+                orig_w, orig_h, crop_w, crop_h, params.get("crop_position", "center")
+            )
+            x = x[:, crop_y:crop_y + crop_h, crop_x:crop_x + crop_w, :]
+        
+        # 抗锯齿缩放到目标尺寸
+        x = F.interpolate(x.permute(0, 3, 1, 2), size=(target_h, target_w), mode="bilinear",
+                          align_corners=False, antialias=True)
+        return torch.clamp(x, 0.0, 1.0).permute(0, 2, 3, 1).contiguous()
+    
+    def calculate_target_size(self, orig_w, orig_h, target_w, target_h, keep_aspect):
+        """与前端预览相同的目标尺寸规则，0 表示保持原样"""
+        if target_w == 0 and target_h == 0:
+            return orig_w, orig_h
+        if target_w == 0:
+            target_w = round(target_h * orig_w / orig_h) if keep_aspect else orig_w
+        elif target_h == 0:
+            target_h = round(target_w * orig_h / orig_w) if keep_aspect else orig_h
+        return max(target_w, 1), max(target_h, 1)
+    
+    def calculate_crop_position(self, orig_w, orig_h, crop_w, crop_h, position):
+        """计算裁剪起始坐标（与前端 calculateCropPosition 一致）"""
+        center_x = (orig_w - crop_w) // 2
+        center_y = (orig_h - crop_h) // 2
+        positions = {
+            "center": (center_x, center_y),
+            "top": (center_x, 0),
+            "bottom": (center_x, orig_h - crop_h),
+            "left": (0, center_y),
+            "right": (orig_w - crop_w, center_y),
+            "top-left": (0, 0),
+            "top-right": (orig_w - crop_w, 0),
+            "bottom-left": (0, orig_h - crop_h),
+            "bottom-right": (orig_w - crop_w, orig_h - crop_h),
+        }
+        crop_x, crop_y = positions.get(position, (center_x, center_y))
+        crop_x = min(max(0, crop_x), max(0, orig_w - crop_w))
+        crop_y = min(max(0, crop_y), max(0, orig_h - crop_h))
+        return crop_x, crop_y
+
+
 # 注册API路由 - 修改为唯一的路由名称
 @PromptServer.instance.routes.post("/dapao_toolbox/realtime_image_adjust/apply")
 async def apply_realtime_adjust(request):
     """
-    接收前端发送的调整后图像数据
+    接收前端发送的调整参数（params），不接收像素数据：前端只持有缩小的代理预览图
     """
     try:
         data = await request.json()
         node_id = str(data.get("node_id"))  # 确保是字符串
-        adjusted_data = data.get("adjusted_data")
+        params = data.get("params")
         
         print(f"[实时图像调整] 接收到节点 {node_id} 的调整数据, 类型: {type(node_id)}")
         print(f"[实时图像调整] 当前存储的节点ID列表: {list(node_data.keys())}")
@@ -134,38 +297,16 @@ async def apply_realtime_adjust(request):
             print(f"[实时图像调整] 警告: 节点 {node_id} 已经处理过，忽略重复请求")
             return web.json_response({"success": False, "error": "已经处理过"})
         
+        if not isinstance(params, dict):
+            # 不标记为已处理，前端可以重新提交
+            return web.json_response({"success": False, "error": "缺少调整参数 params"}, status=400)
+        
         try:
             node_info = node_data[node_id]
             
-            if isinstance(adjusted_data, list):
-                # 从请求中获取调整后的宽高
-                adjusted_width = data.get("width")
-                adjusted_height = data.get("height")
-                
-                batch, orig_height, orig_width, channels = node_info["shape"]
-                
-                # 使用调整后的尺寸
-                if adjusted_width and adjusted_height:
-                    height = adjusted_height
-                    width = adjusted_width
-                else:
-                    height = orig_height
-                    width = orig_width
-                
-                print(f"[实时图像调整] 接收数据: 原始{orig_width}x{orig_height} -> 调整后{width}x{height}")
-                
-                # 将像素数据转换为tensor
-                expected_len = height * width * 4
-                if len(adjusted_data) >= expected_len:
-                    rgba_array = np.array(adjusted_data[:expected_len], dtype=np.uint8).reshape(height, width, 4)
-                    rgb_array = rgba_array[:, :, :3]
-                    tensor_image = torch.from_numpy(rgb_array / 255.0).float().unsqueeze(0)
-                    node_info["result"] = tensor_image
-                    print(f"[实时图像调整] 成功转换图像数据: {tensor_image.shape}")
-                else:
-                    print(f"[实时图像调整] 错误: 数据长度不足 (需要{expected_len}, 实际{len(adjusted_data)})")
-                    # 即使数据不足也要触发Event，避免卡住
-                    node_info["result"] = None
+            # 只接收参数，像素计算在节点线程中对整批原图全精度完成
+            node_info["params"] = params
+            print(f"[实时图像调整] 接收调整参数: {params}")
             
             # 标记为已处理，防止重复请求
             node_info["processed"] = True
@@ -189,6 +330,61 @@ async def apply_realtime_adjust(request):
         return web.json_response({"success": False, "error": str(e)})
 
 
+def expire_stale_sessions():
+    """
+    移除超过超时时间仍未结束的会话（如执行线程已异常退出后遗留的条目），
+    同时触发其事件，确保不会有线程继续阻塞
+    """
+    now = time.time()
+    for node_id, node_info in list(node_data.items()):
+        limit = node_info.get("timeout") or STALE_SESSION_SECONDS
+        if now - node_info.get("created", now) > limit:
+            node_data.pop(node_id, None)
+            node_info["event"].set()
+            print(f"[实时图像调整] 清理过期会话: 节点 {node_id}")
+
+
+@PromptServer.instance.routes.get("/dapao_toolbox/realtime_image_adjust/sessions")
+async def list_realtime_adjust_sessions(request):
+    """
+    列出正在等待应用调整的会话
+    """
+    expire_stale_sessions()
+    now = time.time()
+    sessions = [
+        {
+            "node_id": node_id,
+            "shape": list(node_info["shape"]),
+            "waiting_seconds": round(now - node_info.get("created", now), 1),
+            "timeout_seconds": node_info.get("timeout", 0),
+        }
+        for node_id, node_info in list(node_data.items())
+    ]
+    return web.json_response({"success": True, "sessions": sessions})
+
+
+@PromptServer.instance.routes.post("/dapao_toolbox/realtime_image_adjust/cancel")
+async def cancel_realtime_adjust_session(request):
+    """
+    取消指定会话（或 node_id 为空时取消全部），被取消的节点原图直接输出
+    """
+    try:
+        data = await request.json()
+    except Exception:
+        data = {}
+    node_id = data.get("node_id")
+    node_ids = [str(node_id)] if node_id is not None else list(node_data.keys())
+    
+    cancelled = []
+    for key in node_ids:
+        node_info = node_data.pop(key, None)
+        if node_info is not None:
+            node_info["event"].set()
+            cancelled.append(key)
+    print(f"[实时图像调整] 取消会话: {cancelled}")
+    return web.json_response({"success": True, "cancelled": cancelled})
+
+
 # 节点注册配置
 WEB_DIRECTORY = "web"
 
@@ -0,0 +1,104 @@
+"""
+字符串预处理微基准：表驱动实现（dapao_prompt_preprocess）对比原来的逐字符实现
+
+运行：python tests/bench_prompt_preprocess.py
+先在随机 Unicode / ASCII 文本上确认两种实现结果一致，再分别计时（取 3 次最快值）
+"""
+import os
+import random
+import re
+import sys
+import time
+import unicodedata
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dapao_prompt_preprocess import PREPROCESS_OPTIONS, apply_preprocess, count_nonspace_chars  # noqa: E402
+
+
+# ---- 原实现（随机提示词行提取节点中逐字符处理的版本），作为对照 ----
+
+def reference_preprocess(text, option):
+    if option == "不改变":
+        return text
+    if option == "取数字":
+        return "".join(ch for ch in text if ch.isdigit() or ch == "\n")
+    if option == "取字母":
+        return "".join(ch for ch in text if ("A" <= ch <= "Z") or ("a" <= ch <= "z") or ch == "\n")
+    if option == "转大写":
+        return text.upper()
+    if option == "转小写":
+        return text.lower()
+    if option == "取中文":
+        return "".join(ch for ch in text if ("\u4e00" <= ch <= "\u9fff") or ch == "\n")
+    if option == "去标点":
+        return "".join(ch for ch in text if not unicodedata.category(ch).startswith("P"))
+    if option == "去换行":
+        return text.replace("\r\n", "").replace("\n", "").replace("\r", "")
+    if option == "去空行":
+        return "\n".join(ln for ln in text.splitlines() if ln.strip() != "")
+    if option == "去空格":
+        return "".join(ch for ch in text if (unicodedata.category(ch) != "Zs" and ch != "\t"))
+    if option == "去格式":
+        normalized_lines = []
+        for ln in text.splitlines():
+            normalized = re.sub(r"\s+", " ", ln.replace("\t", " ").replace("\r", " ")).strip()
+            if normalized != "":
+                normalized_lines.append(normalized)
+        return "\n".join(normalized_lines)
+    return text
+
+
+def reference_count_nonspace_chars(text):
+    return sum(1 for ch in text if not ch.isspace())
+
+
+# ---- 一致性检查 ----
+
+def check_equivalence(seed=0):
+    rng = random.Random(seed)
+    unicode_pool = ([chr(c) for c in range(0x3000)] + list("中文字符测试\n\r\t　 ，。！？") * 50
+                    + [chr(c) for c in range(0x1F000, 0x1F100)] + ["²", "٣", " ", "\U0001D7D8", "\U00020000"])
+    ascii_pool = [chr(c) for c in range(128)]
+    for pool in (unicode_pool, ascii_pool):
+        for length in (0, 1, 30, 5000, 50000):
+            text = "".join(rng.choice(pool) for _ in range(length))
+            for option in PREPROCESS_OPTIONS:
+                if option == "统计字数":
+                    continue
+                assert apply_preprocess(text, option) == reference_preprocess(text, option), (option, length)
+            assert count_nonspace_chars(text) == reference_count_nonspace_chars(text), length
+
+
+# ---- 计时 ----
+
+def best_of(func, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench(label, text):
+    print(f"{label}: {len(text)} 字符")
+    for option in PREPROCESS_OPTIONS[1:]:
+        if option == "统计字数":
+            old = best_of(lambda: reference_count_nonspace_chars(text))
+            new = best_of(lambda: count_nonspace_chars(text))
+        else:
+            old = best_of(lambda: reference_preprocess(text, option))
+            new = best_of(lambda: apply_preprocess(text, option))
+        print(f"  {option}  原实现 {old * 1000:8.1f} ms  表驱动 {new * 1000:7.1f} ms  x{old / max(new, 1e-9):6.1f}")
+
+
+def main():
+    check_equivalence()
+    print("随机 Unicode / ASCII 文本上结果一致\n")
+    bench("中英混合", "\n".join(f"Prompt {i}: masterpiece, best quality, 1girl, (smile:1.2), 杰作！ 高清。" for i in range(100000)))
+    bench("纯 ASCII", "\n".join(f"Prompt {i}: masterpiece, best quality, 1girl, (smile:1.2), 8k." for i in range(100000)))
+
+
+if __name__ == "__main__":
+    main()
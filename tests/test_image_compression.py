@@ -0,0 +1,42 @@
+
+import numpy as np
+import pytest
+import torch
+
+from dapao_image_compression_node import DapaoImageCompressionNode
+
+# Torch 模拟与真实 JPEG 编解码之间允许的最低 PSNR (dB)
+MIN_PSNR = 33.0
+
+
+def make_batch(seed=0, batch=3, height=67, width=93):
+    """固定种子的测试批次：平滑渐变叠加噪声，尺寸不是 8 的倍数以覆盖边缘补齐"""
+    rng = np.random.default_rng(seed)
+    y = np.linspace(0.0, 1.0, height, dtype=np.float32)[:, None]
+    x = np.linspace(0.0, 1.0, width, dtype=np.float32)[None, :]
+    images = []
+    for b in range(batch):
+        channels = [x * y, np.sin(3 * x + b) * 0.5 + 0.5, 1 - y]
+        base = np.stack(np.broadcast_arrays(*channels), axis=-1)
+        noise = rng.normal(0.0, 0.05, size=(height, width, 3)).astype(np.float32)
+        images.append(np.clip(base + noise, 0.0, 1.0))
+    return torch.from_numpy(np.stack(images))
+
+
+def psnr(a, b):
+    mse = torch.mean((a.double() - b.double()) ** 2).item()
+    return float("inf") if mse == 0 else 10 * np.log10(1.0 / mse)
+
+
+@pytest.mark.parametrize("quality", [30, 50, 75, 90, 95])
+def test_torch_engine_matches_pil(quality):
+    node = DapaoImageCompressionNode()
+    image = make_batch()
+
+    (pil_result,) = node.compress_image(image, quality, engine="PIL")
+    (torch_result,) = node.compress_image(image, quality, engine="Torch")
+
+    assert torch_result.shape == pil_result.shape == image.shape
+    assert torch_result.dtype == pil_result.dtype == torch.float32
+    for i in range(image.shape[0]):
+        assert psnr(torch_result[i], pil_result[i]) >= MIN_PSNR
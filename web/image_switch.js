@@ -16,6 +16,15 @@ app.registerExtension({
                 // 调用原始方法
                 const result = onNodeCreated ? onNodeCreated.apply(this, arguments) : undefined;
                 
+                // 后端为惰性求值声明了全部 20 个输入，新建节点时只保留默认的 2 个
+                // （加载工作流时 configure 会按保存的端口恢复）
+                for (let i = this.inputs.length - 1; i >= 0; i--) {
+                    const input = this.inputs[i];
+                    if (input.name && input.name.startsWith("image") && parseInt(input.name.substring(5)) > 2) {
+                        this.removeInput(i);
+                    }
+                }
+                
                 // 添加更新输入的方法
                 this.updateInputs = function() {
                     // 找到当前所有image输入的最大索引
@@ -1,5 +1,8 @@
 import { app } from "../../scripts/app.js";
 
+// 最多输入数量（与 make_image_batch_node.py 中的 MAX_IMAGES 保持一致）
+const MAX_IMAGES = 256;
+
 // 为制作图像批次节点添加动态输入功能
 app.registerExtension({
     name: "Dapao.MakeImageBatch",
@@ -38,7 +41,7 @@ app.registerExtension({
                     const allConnected = imageInputs.every(input => input.link != null);
                     
                     // 如果所有输入都已连接，且未达到最大数量，添加新输入
-                    if (allConnected && maxIndex < 20) {
+                    if (allConnected && maxIndex < MAX_IMAGES) {
                         const newIndex = maxIndex + 1;
                         this.addInput(`📸 图像${newIndex}`, "IMAGE");
                     }
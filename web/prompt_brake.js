@@ -2,14 +2,18 @@ import { app } from "../../scripts/app.js";
 import { api } from "../../scripts/api.js";
 import { ComfyWidgets } from "../../scripts/widgets.js";
 
+// 批量审阅时各条提示词之间的分隔行（与 Python 端 BATCH_SEPARATOR 一致）
+const BATCH_SEPARATOR = "\n----------\n";
+const BATCH_SEPARATOR_PATTERN = /\n-{10,}\n/;
+
 app.registerExtension({
     name: "Dapao.PromptBrake",
     async setup() {
         api.addEventListener("dapao.brake.start", (event) => {
-            const { node_id, text, timeout } = event.detail;
+            const { node_id, text, timeout, texts } = event.detail;
             const node = app.graph.getNodeById(node_id);
             if (node) {
-                node.onBrakeStart(text, timeout);
+                node.onBrakeStart(text, timeout, texts);
             }
         });
 
@@ -31,7 +35,9 @@ app.registerExtension({
                 this.brakeState = {
                     active: false,
                     timeoutId: null,
-                    timeLeft: 0
+                    timeLeft: 0,
+                    batchCount: 0,
+                    warning: ""
                 };
 
                 // 1. 获取原有的 timeout 参数 widget (由 Python 定义)
@@ -174,12 +180,15 @@ app.registerExtension({
                 }
             };
 
-            nodeType.prototype.onBrakeStart = function (text, timeout) {
+            nodeType.prototype.onBrakeStart = function (text, timeout, texts) {
                 this.brakeState.active = true;
                 this.brakeState.timeLeft = timeout;
+                // 批量审阅：整个列表放进同一个编辑框，用分隔行区分各条
+                this.brakeState.batchCount = Array.isArray(texts) ? texts.length : 0;
+                this.brakeState.warning = "";
 
                 if (this.textWidget) {
-                    this.textWidget.value = text;
+                    this.textWidget.value = this.brakeState.batchCount ? texts.join(BATCH_SEPARATOR) : text;
                 }
 
                 if (this.domBtn) {
@@ -236,7 +245,9 @@ app.registerExtension({
 
             nodeType.prototype.updateStatus = function () {
                 if (this.brakeState.active && this.statusWidget) {
-                    this.statusWidget.value = `⏳ 倒计时: ${this.brakeState.timeLeft} 秒 | 正在等待...`;
+                    const batchInfo = this.brakeState.batchCount ? ` | 批量 ${this.brakeState.batchCount} 条` : "";
+                    const warning = this.brakeState.warning ? ` | ${this.brakeState.warning}` : "";
+                    this.statusWidget.value = `⏳ 倒计时: ${this.brakeState.timeLeft} 秒${batchInfo} | 正在等待...${warning}`;
                 }
             };
 
@@ -244,6 +255,22 @@ app.registerExtension({
                 if (!this.brakeState.active) return;
 
                 const newText = this.textWidget.value;
+                const payload = {
+                    node_id: this.id.toString(),
+                    text: newText,
+                    action: "continue"
+                };
+                if (this.brakeState.batchCount) {
+                    payload.texts = newText.split(BATCH_SEPARATOR_PATTERN);
+                    // 分隔行被删除或提示词中含有分隔行时条数会变化，提交前拦下，倒计时继续
+                    if (payload.texts.length !== this.brakeState.batchCount) {
+                        this.brakeState.warning = `⚠️ 条数不一致：应为 ${this.brakeState.batchCount} 条，当前 ${payload.texts.length} 条，请检查分隔行`;
+                        this.updateStatus();
+                        app.graph.setDirtyCanvas(true, true);
+                        return;
+                    }
+                    this.brakeState.warning = "";
+                }
 
                 if (this.brakeState.timeoutId) {
                     clearInterval(this.brakeState.timeoutId);
@@ -258,11 +285,7 @@ app.registerExtension({
 
                 api.fetchApi("/dapao/brake/update", {
                     method: "POST",
-                    body: JSON.stringify({
-                        node_id: this.id.toString(),
-                        text: newText,
-                        action: "continue"
-                    }),
+                    body: JSON.stringify(payload),
                 }).then(response => {
                     if (response.ok) {
                         this.statusWidget.value = "✅ 已提交，继续执行...";
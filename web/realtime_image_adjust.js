@@ -208,7 +208,10 @@ app.registerExtension({
                     if (data && data.node_id && data.node_id === this.id.toString()) {
                         console.log(`[实时图像调整] 节点 ${this.id} 接收到更新数据`);
 
-                        if (data.image_data) {
+                        if (data.image_url) {
+                            // 代理预览图：服务端写入临时目录，按URL加载
+                            this.loadImageFromBase64(api.apiURL(data.image_url));
+                        } else if (data.image_data) {
                             this.loadImageFromBase64(data.image_data);
                         }
                     }
@@ -572,7 +575,18 @@ app.registerExtension({
                     const endpoint = '/dapao_toolbox/realtime_image_adjust/apply';
                     const nodeId = String(this.id);
 
-                    console.log(`[实时图像调整] 节点 ${nodeId} 开始应用调整: ${this.finalImageData.width}x${this.finalImageData.height}`);
+                    // 只发送调整参数，由服务端对整批原图全精度计算
+                    const params = {
+                        saturation: this["饱和度"],
+                        contrast: this["对比度"],
+                        brightness: this["亮度"],
+                        target_width: this.target_width || 0,
+                        target_height: this.target_height || 0,
+                        keep_aspect: this.keep_aspect,
+                        crop_position: this.crop_position || "center"
+                    };
+
+                    console.log(`[实时图像调整] 节点 ${nodeId} 开始应用调整:`, params);
 
                     const response = await api.fetchApi(endpoint, {
                         method: 'POST',
@@ -581,9 +595,7 @@ app.registerExtension({
                         },
                         body: JSON.stringify({
                             node_id: nodeId,
-                            adjusted_data: Array.from(this.finalImageData.data),
-                            width: this.finalImageData.width,
-                            height: this.finalImageData.height
+                            params
                         })
                     });
 
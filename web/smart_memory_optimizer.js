@@ -2,10 +2,111 @@ import { app } from "../../scripts/app.js";
 import { api } from "../../scripts/api.js";
 import { ComfyWidgets } from "../../scripts/widgets.js";
 
+// 后台采样折线：按字段绘制，颜色与图例
+const TELEMETRY_SERIES = [
+    { field: "ram_used", label: "RAM", color: "#4fc3f7" },
+    { field: "process_rss", label: "RSS", color: "#81c784" },
+    { field: "swap_used", label: "Swap", color: "#ffb74d" },
+    { field: "torch_reserved", label: "Torch保留", color: "#e57373" },
+    { field: "torch_allocated", label: "Torch已分配", color: "#ba68c8" },
+];
+const TELEMETRY_POLL_MS = 1000;
+const SPARKLINE_HEIGHT = 90;
+
+// 前端缓存的采样窗口（与后端环形缓冲同长度）
+const telemetry = { seq: 0, running: false, capacity: 0, samples: {} };
+
+function formatBytes(n) {
+    if (!n) return "0";
+    if (n >= 1024 ** 3) return `${(n / 1024 ** 3).toFixed(2)}GB`;
+    return `${Math.round(n / 1024 ** 2)}MB`;
+}
+
+function hasOptimizerNode() {
+    return !!app.graph?._nodes?.some(n => n && n.type === "DapaoSmartMemoryOptimizerNode");
+}
+
+async function pollTelemetry() {
+    if (!hasOptimizerNode()) return;
+    try {
+        const resp = await api.fetchApi(`/dapao/memopt/telemetry?since=${telemetry.seq}`);
+        if (!resp.ok) return;
+        const data = await resp.json();
+        // 后端重启后序号会变小，丢弃旧窗口
+        if (data.seq < telemetry.seq) telemetry.samples = {};
+        telemetry.seq = data.seq;
+        telemetry.running = data.running;
+        telemetry.capacity = data.capacity;
+        for (const field of data.fields) {
+            const merged = (telemetry.samples[field] || []).concat(data.samples[field] || []);
+            telemetry.samples[field] = merged.slice(-data.capacity);
+        }
+        if ((data.samples.time || []).length) app.graph.setDirtyCanvas(true, false);
+    } catch (e) {
+        // 采样接口不可用时静默忽略
+    }
+}
+
+function drawSparkline(ctx, nodeWidth, top) {
+    const times = telemetry.samples.time || [];
+    if (times.length < 2) return;
+
+    const margin = 10;
+    const width = nodeWidth - margin * 2;
+    const plotTop = top + 16;
+    const plotHeight = SPARKLINE_HEIGHT - 16;
+    // 所有曲线共用纵轴：以物理内存总量与各序列峰值中较大者为上限
+    const ramTotal = (telemetry.samples.ram_total || []).at(-1) || 0;
+    let yMax = ramTotal;
+    for (const { field } of TELEMETRY_SERIES) {
+        for (const v of telemetry.samples[field] || []) if (v > yMax) yMax = v;
+    }
+    if (yMax <= 0) return;
+
+    ctx.save();
+    ctx.fillStyle = "rgba(0,0,0,0.35)";
+    ctx.fillRect(margin, plotTop, width, plotHeight);
+
+    const t0 = times[0];
+    const span = Math.max(times.at(-1) - t0, 1e-6);
+    const legend = [];
+    for (const { field, label, color } of TELEMETRY_SERIES) {
+        const values = telemetry.samples[field] || [];
+        const peak = values.reduce((a, b) => Math.max(a, b), 0);
+        if (peak <= 0) continue;
+        ctx.strokeStyle = color;
+        ctx.lineWidth = 1.5;
+        ctx.beginPath();
+        for (let i = 0; i < values.length; i++) {
+            const x = margin + ((times[i] - t0) / span) * width;
+            const y = plotTop + plotHeight - (values[i] / yMax) * plotHeight;
+            if (i === 0) ctx.moveTo(x, y);
+            else ctx.lineTo(x, y);
+        }
+        ctx.stroke();
+        legend.push({ color, text: `${label} 峰值${formatBytes(peak)}` });
+    }
+
+    ctx.font = "11px sans-serif";
+    ctx.textBaseline = "top";
+    let x = margin;
+    for (const { color, text } of legend) {
+        ctx.fillStyle = color;
+        ctx.fillText(text, x, top);
+        x += ctx.measureText(text).width + 10;
+    }
+    ctx.fillStyle = "#aaa";
+    ctx.textAlign = "right";
+    ctx.fillText(`${span.toFixed(0)}s${telemetry.running ? "" : " (已停止)"}`, margin + width, top);
+    ctx.restore();
+}
+
 app.registerExtension({
     name: "Dapao.SmartMemoryOptimizer",
 
     async setup() {
+        setInterval(pollTelemetry, TELEMETRY_POLL_MS);
+
         api.addEventListener("dapao.memopt.info", (event) => {
             const { node_id, info } = event.detail || {};
             if (node_id == null) return;
@@ -61,7 +162,17 @@ app.registerExtension({
                 this.dapaoMemoryInfoWidget.inputEl.style.height = "90px";
             }
 
-            this.setSize([520, 360]);
+            // 画布控件占固定高度，避免与多行文本框重叠
+            this.addCustomWidget({
+                name: "dapao_memory_sparkline",
+                type: "dapao_memory_sparkline",
+                value: null,
+                serialize: false,
+                computeSize: (width) => [width, SPARKLINE_HEIGHT + 4],
+                draw: (ctx, node, width, y) => drawSparkline(ctx, width, y),
+            });
+
+            this.setSize([520, 360 + SPARKLINE_HEIGHT]);
             return r;
         };
     },